@@ -1,27 +1,37 @@
 """FastAPI main application for Atlas RAG Assistant."""
 
 import os
+import sys
 import logging
 import tempfile
-from datetime import datetime
-from typing import List, Optional
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
 import asyncio
 import uuid
+import aiofiles
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from fastapi.security import HTTPBearer
 import uvicorn
 
 from rag import (
-    settings,
-    ChatRequest, ChatResponse, SourceCitation,
+    get_settings,
+    ChatMessage, ChatRequest, ChatResponse, SourceCitation, RAGResponse,
     DocumentInfo, DocumentListResponse, UploadResponse, DeleteResponse,
     SettingsResponse, HealthResponse, ErrorResponse,
-    vector_store, document_processor, rag_graph
+    get_vector_store, document_processor, get_document_pool, shutdown_document_pool,
+    get_rag_graph
 )
 
+# The app needs its settings to configure itself
+settings = get_settings()
+
 # Configure logging
 logging.basicConfig(
     level=getattr(logging, settings.log_level.upper()),
@@ -35,7 +45,8 @@ app = FastAPI(
     description="A production-ready RAG application with document management",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -50,18 +61,38 @@ app.add_middleware(
 # Optional security (stub implementation)
 security = HTTPBearer(auto_error=False)
 
+# Read size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Health probes are served from a short-lived cache to keep them off the vector store
+HEALTH_CACHE_TTL = 2.0
+_health_cache = {"ts": 0.0, "payload": None}
+_HEALTHY_SERVICES = {"vector_store": "healthy", "rag_graph": "healthy"}
+_UNHEALTHY_VECTOR_STORE = {"vector_store": "unhealthy", "rag_graph": "healthy"}
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
     logger.info("Starting Yotome RAG Assistant API...")
     
+    # Size the default executor that runs blocking RAG calls and sync graph nodes
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.thread_pool_size, thread_name_prefix="rag")
+    )
+    
+    # Build the RAG graph (and its Azure client) in this worker process
+    get_rag_graph()
+    
+    # Start the worker processes for CPU-bound document parsing up front
+    get_document_pool()
+    
     # Ensure data directories exist
     os.makedirs(settings.chroma_persist_directory, exist_ok=True)
     
     # Test vector store connection
     try:
-        stats = vector_store.get_document_stats()
+        stats = get_vector_store().get_document_stats()
         logger.info(f"Vector store initialized: {stats}")
     except Exception as e:
         logger.error(f"Failed to initialize vector store: {e}")
@@ -70,30 +101,92 @@ async def startup_event():
     logger.info("API startup complete")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections and worker processes on shutdown."""
+    await get_rag_graph().openai_client.close()
+    shutdown_document_pool()
+
+
 @app.get("/api/healthz", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
+    now = time.monotonic()
+    if _health_cache["payload"] is not None and now - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return _health_cache["payload"]
+    
     try:
         # Check vector store
-        stats = vector_store.get_document_stats()
+        stats = get_vector_store().get_document_stats()
         
-        services = {
-            "vector_store": "healthy" if "total_documents" in stats else "unhealthy",
-            "rag_graph": "healthy"
-        }
+        services = _HEALTHY_SERVICES if "total_documents" in stats else _UNHEALTHY_VECTOR_STORE
         
-        return HealthResponse(
+        cache_stats = get_rag_graph().semantic_cache_stats()
+        
+        payload = HealthResponse(
             status="healthy",
-            timestamp=datetime.utcnow(),
-            services=services
+            timestamp=datetime.now(timezone.utc),
+            services=services,
+            semantic_cache=cache_stats
         )
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return HealthResponse(
+        payload = HealthResponse(
             status="unhealthy",
-            timestamp=datetime.utcnow(),
+            timestamp=datetime.now(timezone.utc),
             services={"error": str(e)}
         )
+    
+    _health_cache["ts"] = now
+    _health_cache["payload"] = payload
+    return payload
+
+
+def _to_chat_response(rag_response: RAGResponse) -> ChatResponse:
+    """Convert an internal RAG response to the API format."""
+    sources = []
+    for citation in rag_response.citations:
+        source = SourceCitation(
+            doc_id=citation.get("doc_id", ""),
+            filename=citation.get("filename", ""),
+            chunk_index=citation.get("chunk_index", 0),
+            snippet=citation.get("snippet", ""),
+            score=citation.get("score", 0.0),
+            metadata=citation.get("metadata", {})
+        )
+        sources.append(source)
+    
+    return ChatResponse(
+        answer=rag_response.answer,
+        sources=sources,
+        usage=rag_response.usage,
+        follow_up=rag_response.follow_up
+    )
+
+
+async def _stream_chat_events(
+    query: str,
+    conversation_history: List[ChatMessage],
+    rag_only: bool
+) -> AsyncIterator[bytes]:
+    """Format a streamed RAG answer as server-sent events.
+    
+    Each token is sent as ``{"token": ...}``; the last event carries the
+    sources, usage and follow-up, followed by ``[DONE]``.
+    """
+    async for item in get_rag_graph().stream_query(
+        query=query,
+        conversation_history=conversation_history,
+        rag_only=rag_only
+    ):
+        if isinstance(item, RAGResponse):
+            final = _to_chat_response(item).model_dump(mode="json", exclude={"answer"})
+            logger.info(f"Chat stream completed with {len(final['sources'])} sources")
+            yield b"data: " + orjson.dumps(final) + b"\n\n"
+        else:
+            yield b"data: " + orjson.dumps({"token": item}) + b"\n\n"
+    
+    yield b"data: [DONE]\n\n"
 
 
 @app.post("/api/chat", response_model=ChatResponse)
@@ -115,34 +208,26 @@ async def chat_endpoint(request: ChatRequest):
         if not user_message:
             raise HTTPException(status_code=400, detail="No user message found")
         
+        if request.stream:
+            return StreamingResponse(
+                _stream_chat_events(
+                    query=user_message.content,
+                    conversation_history=request.messages[:-1],
+                    rag_only=request.rag_only
+                ),
+                media_type="text/event-stream"
+            )
+        
         # Process through RAG
-        rag_response = await rag_graph.process_query(
+        rag_response = await get_rag_graph().process_query(
             query=user_message.content,
             conversation_history=request.messages[:-1],  # Exclude the current message
             rag_only=request.rag_only
         )
         
-        # Convert citations to API format
-        sources = []
-        for citation in rag_response.citations:
-            source = SourceCitation(
-                doc_id=citation.get("doc_id", ""),
-                filename=citation.get("filename", ""),
-                chunk_index=citation.get("chunk_index", 0),
-                snippet=citation.get("snippet", ""),
-                score=citation.get("score", 0.0),
-                metadata=citation.get("metadata", {})
-            )
-            sources.append(source)
-        
-        response = ChatResponse(
-            answer=rag_response.answer,
-            sources=sources,
-            usage=rag_response.usage,
-            follow_up=rag_response.follow_up
-        )
+        response = _to_chat_response(rag_response)
         
-        logger.info(f"Chat response generated with {len(sources)} sources")
+        logger.info(f"Chat response generated with {len(response.sources)} sources")
         return response
         
     except Exception as e:
@@ -154,7 +239,7 @@ async def chat_endpoint(request: ChatRequest):
 async def list_documents():
     """List all documents in the knowledge base."""
     try:
-        documents = vector_store.list_documents()
+        documents = get_vector_store().list_documents()
         
         return DocumentListResponse(
             items=documents,
@@ -166,6 +251,16 @@ async def list_documents():
         raise HTTPException(status_code=500, detail=f"Failed to list documents: {str(e)}")
 
 
+def _create_staging_file(filename: str) -> str:
+    """Create an empty staging file for an upload and return its path."""
+    with tempfile.NamedTemporaryFile(
+        delete=False,
+        suffix=os.path.splitext(filename)[1],
+        dir=settings.upload_staging_directory
+    ) as temp_file:
+        return temp_file.name
+
+
 @app.post("/api/docs/upload", response_model=UploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -181,53 +276,98 @@ async def upload_document(
         if tags:
             tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
         
+        # Peek at the start of the upload for content-based MIME detection
+        head = await file.read(UPLOAD_CHUNK_SIZE)
+        
         # Detect MIME type
-        mime_type = document_processor.detect_mime_type(file.filename, "")
+        mime_type = document_processor.detect_mime_type(file.filename, "", head=head)
         if file.content_type:
             mime_type = file.content_type
         
-        # Read file size
-        content = await file.read()
-        file_size = len(content)
-        
-        # Validate file
+        # Validate type and name up front; size is enforced while streaming
         is_valid, error_msg = document_processor.validate_file(
             filename=file.filename,
-            file_size=file_size,
+            file_size=len(head),
             mime_type=mime_type
         )
         
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
         
-        # Save to temporary file for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            temp_file.write(content)
-            temp_path = temp_file.name
+        # Small uploads stay in memory; larger ones spill to a staging file
+        memory_limit = settings.file_size_mb_threshold * 1024 * 1024
+        buffer = bytearray()
+        temp_path = None
         
         try:
+            # Stream the upload without buffering large files in memory,
+            # hashing it on the way for duplicate detection
+            file_size = 0
+            file_hash = hashlib.sha256()
+            out = None
+            try:
+                chunk = head
+                while chunk:
+                    file_size += len(chunk)
+                    if file_size > settings.max_file_size:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File size exceeds maximum allowed ({settings.max_file_size} bytes)"
+                        )
+                    file_hash.update(chunk)
+                    
+                    if out is None and file_size <= memory_limit:
+                        buffer += chunk
+                    else:
+                        if out is None:
+                            temp_path = _create_staging_file(file.filename)
+                            out = await aiofiles.open(temp_path, "wb")
+                            await out.write(buffer)
+                            buffer = bytearray()
+                        await out.write(chunk)
+                    
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            finally:
+                if out is not None:
+                    await out.close()
+            
             # Process the document
-            doc_id, chunks_added = await document_processor.process_file(
-                file_path=temp_path,
+            result = await document_processor.process_file(
+                file_source=temp_path or bytes(buffer),
                 filename=file.filename,
                 mime_type=mime_type,
-                tags=tag_list
+                tags=tag_list,
+                file_hash=file_hash.hexdigest()
             )
             
-            logger.info(f"Uploaded document {file.filename}: {chunks_added} chunks")
+            if result.duplicate:
+                # Nothing was stored; report the existing document as it is stored
+                return UploadResponse(
+                    doc_id=result.doc_id,
+                    filename=result.filename,
+                    chunks=result.chunks,
+                    message=f"Identical file already uploaded as '{result.filename}'; existing document kept",
+                    duplicate=True
+                )
+            
+            logger.info(f"Uploaded document {file.filename}: {result.chunks} chunks")
+            
+            # Cached answers may no longer reflect the knowledge base
+            get_rag_graph().clear_semantic_cache()
             
             return UploadResponse(
-                doc_id=doc_id,
-                filename=file.filename,
-                chunks=chunks_added
+                doc_id=result.doc_id,
+                filename=result.filename,
+                chunks=result.chunks
             )
             
         finally:
             # Clean up temporary file
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp file {temp_path}: {e}")
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except Exception as e:
+                    logger.warning(f"Failed to delete temp file {temp_path}: {e}")
         
     except HTTPException:
         raise
@@ -240,13 +380,15 @@ async def upload_document(
 async def delete_document(doc_id: str):
     """Delete a document from the knowledge base."""
     try:
-        success = vector_store.delete_document(doc_id)
+        success = get_vector_store().delete_document(doc_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Document not found")
         
         logger.info(f"Deleted document {doc_id}")
         
+        get_rag_graph().clear_semantic_cache()
+        
         return DeleteResponse(deleted=True)
         
     except HTTPException:
@@ -257,14 +399,14 @@ async def delete_document(doc_id: str):
 
 
 @app.get("/api/settings", response_model=SettingsResponse)
-async def get_settings():
+async def get_public_settings():
     """Get public application settings."""
     return SettingsResponse(
         max_tokens=settings.max_tokens,
-        chunk_size=settings.chunk_size,
-        chunk_overlap=settings.chunk_overlap,
+        chunk_size=settings.chunk_size_tokens,
+        chunk_overlap=settings.chunk_overlap_tokens,
         top_k=settings.top_k,
-        allowed_mime_types=settings.allowed_mime_types,
+        allowed_mime_types=sorted(settings.allowed_mime_types),
         max_file_size=settings.max_file_size
     )
 
@@ -273,17 +415,35 @@ async def get_settings():
 async def global_exception_handler(request, exc):
     """Global exception handler."""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "detail": "An unexpected error occurred"}
     )
 
 
 if __name__ == "__main__":
+    reload = settings.environment == "development"
+    
+    # Workers only share an index through a Chroma server; an embedded
+    # persistent store or the in-memory FAISS index needs a single process
+    workers = 1 if reload else settings.api_workers
+    if settings.vector_backend == "faiss" and settings.web_concurrency > 1:
+        logger.warning("VECTOR_BACKEND=faiss keeps its index in process memory; running a single worker")
+    if workers > 1 and not settings.chroma_host:
+        logger.warning("Running multiple workers against a local Chroma directory; set CHROMA_HOST to share one server")
+    
+    # Worker processes size their parsing pools and ingest caps by this count
+    # (uvicorn run directly reads the same variable for its worker count)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.environment == "development",
+        workers=workers,
+        # uvloop/httptools ship with uvicorn[standard]; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        reload=reload,
         log_level=settings.log_level.lower()
     )
@@ -0,0 +1,126 @@
+"""One-shot migration of stored chunk metadata to the compact layout.
+
+Older chunks carry document-level fields (filename, mime_type, tags, ...)
+and string hashes/timestamps on every record. This rewrites each chunk to
+{doc_id, chunk_index, h} and converts document records' ``uploaded_at`` to
+epoch seconds. Safe to re-run; stop the API while it runs, since Chroma
+chunks are deleted and re-added batch by batch.
+
+Usage: cd backend && python migrate_metadata.py
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+
+from rag.settings import get_settings
+from rag.retriever import get_vector_store, _content_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("migrate_metadata")
+
+BATCH_SIZE = 1000
+
+COMPACT_FIELDS = ("doc_id", "chunk_index", "h")
+
+
+def _epoch(value):
+    """Convert an ISO upload time to epoch seconds; leave anything else alone."""
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _is_compact(meta):
+    return "h" in meta and set(meta) <= set(COMPACT_FIELDS)
+
+
+def migrate_chroma(store):
+    """Rewrite legacy chunk and document records in the Chroma collections."""
+    ids = store.collection.get(include=[])["ids"]
+    migrated = 0
+
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = store.collection.get(
+            ids=ids[start:start + BATCH_SIZE],
+            include=["documents", "metadatas", "embeddings"]
+        )
+        stale = [
+            (chunk_id, content, meta, embedding)
+            for chunk_id, content, meta, embedding in zip(
+                batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"]
+            )
+            if not _is_compact(meta)
+        ]
+        if not stale:
+            continue
+
+        # Chroma merges metadata on update and can't drop keys, so stale
+        # chunks are rewritten with the vectors they already have
+        stale_ids = [chunk_id for chunk_id, _, _, _ in stale]
+        store.collection.delete(ids=stale_ids)
+        store.collection.add(
+            ids=stale_ids,
+            embeddings=[list(embedding) for _, _, _, embedding in stale],
+            documents=[content for _, content, _, _ in stale],
+            metadatas=[
+                {"doc_id": meta["doc_id"], "chunk_index": meta.get("chunk_index", 0), "h": _content_hash(content)}
+                for _, content, meta, _ in stale
+            ]
+        )
+        migrated += len(stale)
+
+    records = store.documents.get(include=["metadatas"])
+    stale = [
+        (doc_id, meta) for doc_id, meta in zip(records["ids"], records["metadatas"] or [])
+        if isinstance(meta.get("uploaded_at"), str)
+    ]
+    if stale:
+        store.documents.update(
+            ids=[doc_id for doc_id, _ in stale],
+            metadatas=[{"uploaded_at": _epoch(meta["uploaded_at"])} for _, meta in stale]
+        )
+
+    logger.info(f"Migrated {migrated} chunks and {len(stale)} document records")
+
+
+def migrate_faiss(store):
+    """Rewrite legacy chunk and document records in the FAISS side tables."""
+    with store._lock:
+        rows = store.db.execute("SELECT id, content, metadata FROM chunks").fetchall()
+        updates = []
+        for faiss_id, content, metadata in rows:
+            meta = json.loads(metadata)
+            if _is_compact(meta):
+                continue
+            compact = {"doc_id": meta["doc_id"], "chunk_index": meta.get("chunk_index", 0), "h": _content_hash(content)}
+            updates.append((json.dumps(compact), faiss_id))
+        store.db.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", updates)
+
+        documents = store.db.execute("SELECT doc_id, record FROM documents").fetchall()
+        stale = []
+        for doc_id, record in documents:
+            record = json.loads(record)
+            if isinstance(record.get("uploaded_at"), str):
+                record["uploaded_at"] = _epoch(record["uploaded_at"])
+                stale.append((json.dumps(record), doc_id))
+        store.db.executemany("UPDATE documents SET record = ? WHERE doc_id = ?", stale)
+        store.db.commit()
+
+    logger.info(f"Migrated {len(updates)} chunks and {len(stale)} document records")
+
+
+def main():
+    # Opening the store backfills the document records the compact chunks rely on
+    store = get_vector_store()
+    if get_settings().vector_backend == "faiss":
+        migrate_faiss(store)
+    else:
+        migrate_chroma(store)
+
+
+if __name__ == "__main__":
+    main()
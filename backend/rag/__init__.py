@@ -1,21 +1,21 @@
 """RAG module initialization."""
 
-from .settings import settings
+from .settings import get_settings
 from .models import (
     ChatMessage, ChatRequest, ChatResponse, SourceCitation,
     DocumentInfo, DocumentListResponse, UploadResponse, DeleteResponse,
-    SettingsResponse, HealthResponse, ErrorResponse
+    SettingsResponse, HealthResponse, ErrorResponse, RAGResponse
 )
-from .retriever import vector_store
-from .ingest import document_processor
-from .graph import rag_graph
+from .retriever import get_vector_store
+from .ingest import document_processor, get_document_pool, shutdown_document_pool
+from .graph import get_rag_graph
 
 __all__ = [
-    "settings",
+    "get_settings",
     "ChatMessage", "ChatRequest", "ChatResponse", "SourceCitation",
     "DocumentInfo", "DocumentListResponse", "UploadResponse", "DeleteResponse",
-    "SettingsResponse", "HealthResponse", "ErrorResponse",
-    "vector_store",
-    "document_processor", 
-    "rag_graph"
+    "SettingsResponse", "HealthResponse", "ErrorResponse", "RAGResponse",
+    "get_vector_store",
+    "document_processor", "get_document_pool", "shutdown_document_pool",
+    "get_rag_graph"
 ]
@@ -0,0 +1,121 @@
+"""Persistent on-disk cache of text embeddings."""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 500
+
+# Pruning also removes this fraction of max_entries, so it runs rarely
+_PRUNE_SLACK = 0.1
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache keyed by sha256(model | text).
+
+    The model is part of the key, so switching embedding deployments never
+    returns vectors from the old model. Vectors are stored as raw float32.
+
+    ``ts`` is refreshed on every hit, and once the cache holds more than
+    ``max_entries`` vectors the least recently used ones are pruned (0 means
+    unbounded). Vectors of deleted documents are not removed eagerly; they
+    age out the same way.
+    """
+
+    def __init__(self, path: str, model: str, max_entries: int = 0):
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash BLOB PRIMARY KEY, vec BLOB NOT NULL, model TEXT NOT NULL, ts INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_ts ON embeddings (ts)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}|{text}".encode()).digest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for a text, if present."""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached embeddings in input order, with None for misses."""
+        keys = [self._key(text) for text in texts]
+        found = {}
+        now = int(time.time())
+
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+            # Mark hits as recently used so pruning keeps them
+            if found and self.max_entries:
+                self._conn.executemany(
+                    "UPDATE embeddings SET ts = ? WHERE hash = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        return [
+            np.frombuffer(found[key], dtype=np.float32) if key in found else None
+            for key in keys
+        ]
+
+    def put(self, text: str, vec: Sequence[float]):
+        """Store the embedding for a text."""
+        self.put_many([text], [vec])
+
+    def put_many(self, texts: Sequence[str], vecs: Sequence[Sequence[float]]):
+        """Store embeddings for several texts in one transaction."""
+        now = int(time.time())
+        rows = [
+            (self._key(text), np.asarray(vec, dtype=np.float32).tobytes(), self.model, now)
+            for text, vec in zip(texts, vecs)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec, model, ts) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+            # Replaced rows are counted too; the recount after pruning corrects it
+            self._count += len(rows)
+            if self.max_entries and self._count > self.max_entries:
+                self._prune()
+
+    def _prune(self):
+        """Drop the least recently used vectors (caller must hold the lock)."""
+        excess = self._count - self.max_entries + int(self.max_entries * _PRUNE_SLACK)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE hash IN "
+            "(SELECT hash FROM embeddings ORDER BY ts LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.debug(f"Pruned embedding cache to {self._count} entries")
@@ -0,0 +1,304 @@
+"""In-process FAISS vector store backend."""
+
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+from .settings import get_settings
+from .models import RetrievedChunk
+from .retriever import VectorStore, _mmr_select
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.faiss"
+CHUNKS_FILENAME = "chunks.sqlite3"
+
+
+def _faiss_id(chunk_id: str) -> int:
+    """Derive a stable non-negative int64 FAISS id from a chunk id."""
+    digest = hashlib.blake2b(chunk_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class FaissVectorStore(VectorStore):
+    """Vector store backed by an in-process FAISS index.
+
+    Embeddings are L2-normalized so inner product equals cosine similarity.
+    Chunk content, metadata and vectors live in a SQLite side table keyed by
+    the FAISS id, which also serves filtered searches; document records live
+    in a second table.
+    The index lives in process memory, so run a single API worker with this
+    backend.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.db = None
+        self._lock = threading.RLock()
+        super().__init__()
+
+    def _init_index(self):
+        """Load or create the FAISS index and its SQLite side table."""
+        settings = get_settings()
+        if faiss is None:
+            raise ImportError("faiss is not installed; install faiss-cpu to use VECTOR_BACKEND=faiss")
+
+        os.makedirs(settings.faiss_dir, exist_ok=True)
+        faiss.omp_set_num_threads(os.cpu_count() or 1)
+
+        self.db = sqlite3.connect(os.path.join(settings.faiss_dir, CHUNKS_FILENAME), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, doc_id TEXT NOT NULL, "
+            "chunk_index INTEGER NOT NULL, content TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, vec BLOB NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, file_hash TEXT, record TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS documents_file_hash ON documents (file_hash)")
+        self.db.commit()
+
+        index_path = os.path.join(settings.faiss_dir, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            self.index = faiss.read_index(index_path)
+
+        logger.info(f"Initialized FAISS with {self.index.ntotal if self.index else 0} chunks")
+
+    def _new_index(self, dim: int):
+        """Create an empty id-mapped index of the configured type."""
+        settings = get_settings()
+        if settings.faiss_index_type == "hnsw":
+            base = faiss.IndexHNSWFlat(dim, settings.faiss_hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            base = faiss.IndexFlatIP(dim)
+        return faiss.IndexIDMap2(base)
+
+    def _save_index(self):
+        """Persist the index (caller must hold the lock)."""
+        settings = get_settings()
+        faiss.write_index(self.index, os.path.join(settings.faiss_dir, INDEX_FILENAME))
+
+    @staticmethod
+    def _normalized(vectors: Any) -> np.ndarray:
+        """Return vectors as a new contiguous, L2-normalized float32 matrix."""
+        # normalize_L2 works in place and ignores the read-only flag of the
+        # shared query-embedding cache entries, so always normalize a copy
+        matrix = np.array(vectors, dtype=np.float32, copy=True, ndmin=2, order="C")
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def _add_chunks(
+        self,
+        chunk_ids: List[str],
+        embeddings: List[List[float]],
+        chunks: List[str],
+        chunk_metadata: List[Dict[str, Any]]
+    ):
+        """Write prepared chunks to the index and the side table."""
+        vectors = self._normalized(embeddings)
+        ids = np.fromiter((_faiss_id(chunk_id) for chunk_id in chunk_ids), dtype=np.int64, count=len(chunk_ids))
+        rows = [
+            (int(faiss_id), chunk_id, meta["doc_id"], meta["chunk_index"], chunk, json.dumps(meta), vector.tobytes())
+            for faiss_id, chunk_id, chunk, meta, vector in zip(ids, chunk_ids, chunks, chunk_metadata, vectors)
+        ]
+
+        with self._lock:
+            if self.index is None:
+                self.index = self._new_index(vectors.shape[1])
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO chunks "
+                "(id, chunk_id, doc_id, chunk_index, content, metadata, vec) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.db.commit()
+            self.index.add_with_ids(vectors, ids)
+            self._save_index()
+
+    def _put_document(self, record: Dict[str, Any]):
+        """Store the document-level record for a document."""
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, file_hash, record) VALUES (?, ?, ?)",
+                (record["doc_id"], record.get("file_hash"), json.dumps(record))
+            )
+            self.db.commit()
+
+    def _get_documents(self) -> List[Dict[str, Any]]:
+        """Return the document-level records of all documents."""
+        with self._lock:
+            rows = self.db.execute("SELECT record FROM documents").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def find_document_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the document record of an already ingested file with this hash."""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT record FROM documents WHERE file_hash = ? LIMIT 1",
+                (file_hash,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _get_filenames(self, doc_ids: Iterable[str]) -> Dict[str, str]:
+        """Return doc_id -> filename, reading unseen documents from the side table."""
+        missing = [doc_id for doc_id in set(doc_ids) if doc_id not in self._filenames]
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            with self._lock:
+                rows = self.db.execute(
+                    f"SELECT doc_id, record FROM documents WHERE doc_id IN ({placeholders})",
+                    missing
+                ).fetchall()
+            for doc_id, record in rows:
+                self._filenames[doc_id] = json.loads(record).get("filename", "unknown")
+        return self._filenames
+
+    def _search_by_vector(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> List[RetrievedChunk]:
+        """Search for the chunks nearest to an already computed query embedding."""
+        settings = get_settings()
+        if top_k is None:
+            top_k = settings.top_k
+
+        query = self._normalized(query_embedding)
+
+        # MMR reranks a larger candidate pool down to top_k
+        use_mmr = settings.mmr_enabled and settings.mmr_fetch_k > top_k
+        fetch_k = settings.mmr_fetch_k if use_mmr else top_k
+
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            if doc_ids:
+                # Filtered sets are small; score them exactly from the side table
+                placeholders = ",".join("?" * len(doc_ids))
+                rows = self.db.execute(
+                    f"SELECT id, vec FROM chunks WHERE doc_id IN ({placeholders})",
+                    doc_ids
+                ).fetchall()
+                if not rows:
+                    return []
+                candidate_ids = np.array([row[0] for row in rows], dtype=np.int64)
+                vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+                sims = vectors @ query[0]
+                order = np.argsort(-sims)[:fetch_k]
+                hit_ids, hit_scores = candidate_ids[order], sims[order]
+            else:
+                sims, ids = self.index.search(query, fetch_k)
+                found = ids[0] >= 0
+                hit_ids, hit_scores = ids[0][found], sims[0][found]
+
+            if not len(hit_ids):
+                return []
+
+            placeholders = ",".join("?" * len(hit_ids))
+            rows = self.db.execute(
+                f"SELECT id, content, metadata, vec FROM chunks WHERE id IN ({placeholders})",
+                hit_ids.tolist()
+            ).fetchall()
+
+        by_id = {row[0]: row for row in rows}
+        hits = [(by_id[faiss_id], score) for faiss_id, score in zip(hit_ids.tolist(), hit_scores.tolist()) if faiss_id in by_id]
+
+        if use_mmr and len(hits) > top_k:
+            vectors = np.frombuffer(b"".join(row[3] for row, _ in hits), dtype=np.float32).reshape(len(hits), -1)
+            hits = [hits[i] for i in _mmr_select(query[0], vectors, top_k, settings.mmr_lambda)]
+
+        metadatas = [json.loads(row[2]) for row, _ in hits]
+        filenames = self._get_filenames(meta.get("doc_id", "unknown") for meta in metadatas)
+
+        chunks = []
+        for (row, score), meta in zip(hits, metadatas):
+            chunks.append(RetrievedChunk.model_construct(
+                doc_id=meta.get("doc_id", "unknown"),
+                filename=meta.get("filename") or filenames.get(meta.get("doc_id"), "unknown"),
+                chunk_index=meta.get("chunk_index", 0),
+                content=row[1],
+                score=score,
+                metadata=meta
+            ))
+
+        return chunks
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Delete all chunks for a document."""
+        settings = get_settings()
+        try:
+            with self._lock:
+                ids = [row[0] for row in self.db.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,))]
+
+                if not ids:
+                    logger.warning(f"No chunks found for document {doc_id}")
+                    return False
+
+                self.db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                self.db.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                self.db.commit()
+                self._filenames.pop(doc_id, None)
+
+                if settings.faiss_index_type == "hnsw":
+                    # HNSW graphs don't support removal; rebuild from the side table
+                    self._rebuild_index()
+                else:
+                    self.index.remove_ids(np.array(ids, dtype=np.int64))
+                self._save_index()
+
+            logger.info(f"Deleted {len(ids)} chunks for document {doc_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete document {doc_id}: {e}")
+            raise
+
+    def _rebuild_index(self):
+        """Rebuild the index from the vectors in the side table (caller must hold the lock)."""
+        rows = self.db.execute("SELECT id, vec FROM chunks").fetchall()
+        index = self._new_index(self.index.d)
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            index.add_with_ids(vectors, ids)
+        self.index = index
+
+    def get_document_stats(self) -> Dict[str, Any]:
+        """Get statistics about the vector store."""
+        settings = get_settings()
+        try:
+            with self._lock:
+                total_chunks = self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+                total_documents = self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+            return {
+                "total_documents": total_documents,
+                "total_chunks": total_chunks,
+                "avg_chunks_per_doc": total_chunks / total_documents if total_documents else 0,
+                "collection_name": f"faiss:{settings.faiss_index_type}"
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get document stats: {e}")
+            return {"error": str(e)}
@@ -1,15 +1,21 @@
 """LangGraph implementation for RAG workflow."""
 
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import re
+from typing import Dict, Any, List, Optional, Tuple, TypedDict, AsyncIterator, Union
 import json
-from openai import AzureOpenAI
+import httpx
+import numpy as np
+from openai import AsyncAzureOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
 
-from .settings import settings
+from .settings import get_settings
 from .models import RAGContext, RAGResponse, RetrievedChunk, TokenUsage, ChatMessage
-from .retriever import vector_store
+from .retriever import get_vector_store
+from .semantic_cache import CacheGeneration, SemanticCache
+from .llm_limiter import LLMLimiter
 from .prompts import (
     build_rag_prompt,
     ROUTER_PROMPT,
@@ -19,35 +25,67 @@ from .prompts import (
 
 logger = logging.getLogger(__name__)
 
+# Inline citations look like [filename#chunk]
+_CITATION_RE = re.compile(r'\[([^\]]+)#(\d+)\]')
 
-class RAGState(Dict[str, Any]):
+# Characters of chunk content shown in citation snippets
+SNIPPET_LENGTH = 200
+
+ERROR_ANSWER = "I encountered an error while processing your request. Please try again or contact support if the issue persists."
+NO_INFORMATION_ANSWER = "I don't have enough information to answer your question."
+
+
+class RAGState(TypedDict):
     """State for the RAG graph."""
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Initialize required keys
-        self.setdefault("query", "")
-        self.setdefault("conversation_history", [])
-        self.setdefault("rag_only", True)
-        self.setdefault("retrieved_chunks", [])
-        self.setdefault("answer", "")
-        self.setdefault("citations", [])
-        self.setdefault("confidence", 0.0)
-        self.setdefault("follow_up", None)
-        self.setdefault("usage", None)
-        self.setdefault("route_decision", "")
-        self.setdefault("error", None)
+    query: str
+    conversation_history: List[Dict[str, str]]
+    rag_only: bool
+    retrieved_chunks: List[Dict[str, Any]]
+    chunk_scores: np.ndarray
+    answer: str
+    citations: List[Dict[str, Any]]
+    confidence: float
+    follow_up: Optional[str]
+    usage: Optional[Dict[str, int]]
+    route_decision: str
+    no_context: bool
+    error: Optional[str]
 
 
 class RAGGraph:
     """LangGraph-based RAG implementation."""
     
     def __init__(self):
-        self.openai_client = AzureOpenAI(
+        settings = get_settings()
+        
+        # HTTP/2 lets concurrent completions multiplex over one TLS connection
+        self.openai_client = AsyncAzureOpenAI(
             api_key=settings.azure_openai_api_key,
             api_version=settings.azure_openai_api_version,
-            azure_endpoint=settings.azure_openai_endpoint
+            azure_endpoint=settings.azure_openai_endpoint,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                timeout=httpx.Timeout(settings.llm_timeout, connect=2.0)
+            )
         )
+        self.llm_limiter = LLMLimiter(self.openai_client, max_concurrency=settings.llm_max_concurrency)
+        # The prompt depends on rag_only, so each mode caches its own answers
+        self.semantic_caches: Dict[bool, SemanticCache] = {}
+        self.cache_generation: Optional[CacheGeneration] = None
+        self._seen_generation = 0
+        if settings.semantic_cache_enabled and settings.semantic_cache_max_entries > 0:
+            self.semantic_caches = {
+                rag_only: SemanticCache(
+                    max_entries=settings.semantic_cache_max_entries,
+                    threshold=settings.semantic_cache_threshold,
+                    ttl_seconds=settings.semantic_cache_ttl_seconds
+                )
+                for rag_only in (True, False)
+            }
+            # Other workers' uploads and deletes invalidate this worker's caches
+            self.cache_generation = CacheGeneration(settings.semantic_cache_sync_path)
+            self._seen_generation = self.cache_generation.current()
         self.graph = self._build_graph()
     
     def _build_graph(self) -> CompiledStateGraph:
@@ -55,77 +93,57 @@ class RAGGraph:
         workflow = StateGraph(RAGState)
         
         # Add nodes
-        workflow.add_node("router", self._router_node)
         workflow.add_node("retrieve", self._retrieve_node)
         workflow.add_node("grounded_answer", self._grounded_answer_node)
         workflow.add_node("guardrails", self._guardrails_node)
         workflow.add_node("finalize", self._finalize_node)
-        workflow.add_node("handle_error", self._handle_error_node)
         
-        # Set entry point
-        workflow.set_entry_point("router")
+        # Routing happens in _preflight, so the graph only covers the retrieve path
+        workflow.set_entry_point("retrieve")
         
-        # Add conditional edges
+        workflow.add_edge("retrieve", "grounded_answer")
         workflow.add_conditional_edges(
-            "router",
-            self._route_decision,
+            "grounded_answer",
+            self._after_answer,
             {
-                "retrieve": "retrieve",
-                "error": "handle_error",
-                "clarify": "finalize"
+                "guardrails": "guardrails",
+                "finalize": "finalize"
             }
         )
-        
-        workflow.add_edge("retrieve", "grounded_answer")
-        workflow.add_edge("grounded_answer", "guardrails")
         workflow.add_edge("guardrails", "finalize")
         workflow.add_edge("finalize", END)
-        workflow.add_edge("handle_error", END)
         
         return workflow.compile()
     
-    def _router_node(self, state: RAGState) -> RAGState:
-        """Route the query to appropriate handling."""
-        try:
-            query = state["query"]
-            rag_only = state["rag_only"]
-            
-            # Simple routing logic
-            if not query.strip():
-                state["route_decision"] = "error"
-                state["error"] = "Empty query provided"
-                return state
-            
-            # Check if query is too short or vague
-            if len(query.strip().split()) < 2:
-                state["route_decision"] = "clarify"
-                state["follow_up"] = "Could you please provide more details about what you're looking for?"
-                return state
-            
-            # For now, always route to retrieve for knowledge questions
-            state["route_decision"] = "retrieve"
-            
-            logger.debug(f"Router decision: {state['route_decision']}")
-            return state
-            
-        except Exception as e:
-            logger.error(f"Router node error: {e}")
-            state["route_decision"] = "error"
-            state["error"] = f"Router error: {str(e)}"
-            return state
-    
-    def _route_decision(self, state: RAGState) -> str:
-        """Determine the next step based on router decision."""
-        return state.get("route_decision", "error")
+    def _preflight(self, query: str) -> Optional[RAGResponse]:
+        """Answer queries that need no retrieval without entering the graph."""
+        query = query.strip()
+        
+        if not query:
+            logger.error("RAG workflow error: Empty query provided")
+            return RAGResponse(answer=ERROR_ANSWER, confidence=0.0)
+        
+        # Query is too short or vague to retrieve on
+        if len(query.split()) < 2:
+            return RAGResponse(
+                answer=NO_INFORMATION_ANSWER,
+                follow_up="Could you please provide more details about what you're looking for?",
+                confidence=0.0
+            )
+        
+        return None
     
     def _retrieve_node(self, state: RAGState) -> RAGState:
         """Retrieve relevant chunks from the vector store."""
+        settings = get_settings()
         try:
             query = state["query"]
             
-            # Search the vector store
-            retrieved_chunks = vector_store.search(
-                query=query,
+            # Search the vector store (query embeddings are memoized)
+            vector_store = get_vector_store()
+            query_embedding = vector_store._embed(query)
+            retrieved_chunks = vector_store._search_by_vector(
+                query_embedding,
                 top_k=settings.top_k
             )
             
@@ -137,12 +155,18 @@ class RAGGraph:
                     "filename": chunk.filename,
                     "chunk_index": chunk.chunk_index,
                     "content": chunk.content,
-                    "score": chunk.score,
-                    "metadata": chunk.metadata
+                    "snippet": chunk.content[:SNIPPET_LENGTH] + "..." if len(chunk.content) > SNIPPET_LENGTH else chunk.content,
+                    "score": chunk.score
                 }
                 chunks_data.append(chunk_dict)
             
             state["retrieved_chunks"] = chunks_data
+            # Scores are kept as a contiguous column for vectorized aggregation
+            state["chunk_scores"] = np.fromiter(
+                (chunk.score for chunk in retrieved_chunks),
+                dtype=np.float32,
+                count=len(retrieved_chunks)
+            )
             
             logger.debug(f"Retrieved {len(chunks_data)} chunks")
             return state
@@ -152,8 +176,9 @@ class RAGGraph:
             state["error"] = f"Retrieval error: {str(e)}"
             return state
     
-    def _grounded_answer_node(self, state: RAGState) -> RAGState:
+    async def _grounded_answer_node(self, state: RAGState) -> RAGState:
         """Generate grounded answer from retrieved chunks."""
+        settings = get_settings()
         try:
             query = state["query"]
             chunks = state["retrieved_chunks"]
@@ -162,6 +187,8 @@ class RAGGraph:
             if not chunks:
                 state["answer"] = "I don't have enough information in my knowledge base to answer your question. You might want to upload relevant documents or ask about something else."
                 state["confidence"] = 0.0
+                state["no_context"] = True
+                state["route_decision"] = "skip_guardrails"
                 return state
             
             # Build the prompt
@@ -172,8 +199,8 @@ class RAGGraph:
                 rag_only=state["rag_only"]
             )
             
-            # Generate response
-            response = self.openai_client.chat.completions.create(
+            # Generate response (waits for a free LLM slot)
+            response = await self.llm_limiter.submit(
                 model=settings.azure_openai_deployment,
                 messages=[
                     {"role": "system", "content": prompt},
@@ -190,7 +217,7 @@ class RAGGraph:
             citations = self._extract_citations(answer, chunks)
             
             # Calculate confidence based on chunk scores and answer quality
-            confidence = self._calculate_confidence(chunks, answer)
+            confidence = self._calculate_confidence(state["chunk_scores"], answer)
             
             state["answer"] = answer
             state["citations"] = citations
@@ -211,6 +238,10 @@ class RAGGraph:
             state["error"] = f"Answer generation error: {str(e)}"
             return state
     
+    def _after_answer(self, state: RAGState) -> str:
+        """Skip guardrails for canned no-context replies."""
+        return "finalize" if state.get("no_context") else "guardrails"
+    
     def _guardrails_node(self, state: RAGState) -> RAGState:
         """Apply guardrails to the generated answer."""
         try:
@@ -221,7 +252,7 @@ class RAGGraph:
             
             # Simple guardrails checks
             # Check for potential hallucinations (claims without citations)
-            if "[" not in answer and state["retrieved_chunks"]:
+            if _CITATION_RE.search(answer) is None and state["retrieved_chunks"]:
                 logger.warning("Answer lacks citations despite having retrieved chunks")
                 state["follow_up"] = "I found relevant information but couldn't properly cite the sources. Could you rephrase your question?"
             
@@ -245,7 +276,7 @@ class RAGGraph:
             
             # Ensure we have a valid answer
             if not state.get("answer"):
-                state["answer"] = "I don't have enough information to answer your question."
+                state["answer"] = NO_INFORMATION_ANSWER
                 state["confidence"] = 0.0
             
             return state
@@ -255,41 +286,32 @@ class RAGGraph:
             state["error"] = f"Finalization error: {str(e)}"
             return state
     
-    def _handle_error_node(self, state: RAGState) -> RAGState:
-        """Handle errors in the workflow."""
-        error_msg = state.get("error", "Unknown error occurred")
-        logger.error(f"RAG workflow error: {error_msg}")
-        
-        state["answer"] = "I encountered an error while processing your request. Please try again or contact support if the issue persists."
-        state["confidence"] = 0.0
-        state["citations"] = []
-        
-        return state
-    
     def _extract_citations(self, answer: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Extract citation information from the answer."""
         citations = []
         
         # Look for citation patterns like [filename#chunk]
-        import re
-        citation_pattern = r'\[([^\]]+)#(\d+)\]'
-        matches = re.findall(citation_pattern, answer)
+        matches = _CITATION_RE.findall(answer)
         
-        for filename, chunk_idx in matches:
-            # Find matching chunk
+        if matches:
+            # Index chunks once; the first chunk wins on duplicate keys
+            by_key = {}
             for chunk in chunks:
-                if (chunk["filename"] == filename and 
-                    chunk["chunk_index"] == int(chunk_idx)):
-                    
-                    citation = {
-                        "doc_id": chunk["doc_id"],
-                        "filename": chunk["filename"],
-                        "chunk_index": chunk["chunk_index"],
-                        "score": chunk["score"],
-                        "snippet": chunk["content"][:200] + "..." if len(chunk["content"]) > 200 else chunk["content"]
-                    }
-                    citations.append(citation)
-                    break
+                by_key.setdefault((chunk["filename"], chunk["chunk_index"]), chunk)
+            
+            for filename, chunk_idx in matches:
+                chunk = by_key.get((filename, int(chunk_idx)))
+                if chunk is None:
+                    continue
+                
+                citation = {
+                    "doc_id": chunk["doc_id"],
+                    "filename": chunk["filename"],
+                    "chunk_index": chunk["chunk_index"],
+                    "score": chunk["score"],
+                    "snippet": chunk["snippet"]
+                }
+                citations.append(citation)
         
         # If no explicit citations found, include top chunks as potential sources
         if not citations and chunks:
@@ -299,19 +321,19 @@ class RAGGraph:
                     "filename": chunk["filename"],
                     "chunk_index": chunk["chunk_index"],
                     "score": chunk["score"],
-                    "snippet": chunk["content"][:200] + "..." if len(chunk["content"]) > 200 else chunk["content"]
+                    "snippet": chunk["snippet"]
                 }
                 citations.append(citation)
         
         return citations
     
-    def _calculate_confidence(self, chunks: List[Dict[str, Any]], answer: str) -> float:
+    def _calculate_confidence(self, scores: np.ndarray, answer: str) -> float:
         """Calculate confidence score for the answer."""
-        if not chunks:
+        if not scores.size:
             return 0.0
         
         # Base confidence on average chunk score
-        avg_score = sum(chunk["score"] for chunk in chunks) / len(chunks)
+        avg_score = float(scores.mean())
         
         # Boost confidence if answer has citations
         citation_boost = 0.1 if "[" in answer else 0.0
@@ -322,6 +344,109 @@ class RAGGraph:
         confidence = (avg_score + citation_boost) * length_factor
         return min(confidence, 1.0)
     
+    def _initial_state(
+        self,
+        query: str,
+        conversation_history: Optional[List[ChatMessage]],
+        rag_only: bool
+    ) -> RAGState:
+        """Build the starting graph state for a query."""
+        # Convert conversation history to dict format
+        history_dict = []
+        if conversation_history:
+            for msg in conversation_history:
+                history_dict.append({
+                    "role": msg.role,
+                    "content": msg.content
+                })
+        
+        return RAGState(
+            query=query,
+            conversation_history=history_dict,
+            rag_only=rag_only,
+            retrieved_chunks=[],
+            chunk_scores=np.empty(0, dtype=np.float32),
+            answer="",
+            citations=[],
+            confidence=0.0,
+            follow_up=None,
+            usage=None,
+            route_decision="",
+            no_context=False,
+            error=None
+        )
+    
+    def _build_response(self, final_state: RAGState) -> RAGResponse:
+        """Convert a finished graph state into a RAGResponse."""
+        return RAGResponse(
+            answer=final_state.get("answer", ""),
+            citations=final_state.get("citations", []),
+            confidence=final_state.get("confidence", 0.0),
+            follow_up=final_state.get("follow_up"),
+            usage=TokenUsage(**final_state["usage"]) if final_state.get("usage") else None
+        )
+    
+    def _lookup_cached_response(
+        self,
+        query: str,
+        rag_only: bool
+    ) -> Tuple[np.ndarray, int, Optional[RAGResponse]]:
+        """Embed the query and look up a cached answer in the cache for its mode.
+        
+        Blocking (embedding and the shared generation read), so it runs in a
+        thread. Also returns the generation the lookup saw, which an answer
+        generated afterwards must still match to be cached.
+        """
+        query_embedding = get_vector_store()._embed(query)
+        generation = self.cache_generation.current()
+        if generation != self._seen_generation:
+            # The knowledge base changed in another worker
+            for cache in self.semantic_caches.values():
+                cache.clear()
+            self._seen_generation = generation
+        
+        cached = self.semantic_caches[rag_only].get(query_embedding)
+        if cached is not None:
+            # No completion ran for this request, so it used no tokens
+            cached = cached.model_copy(update={"usage": None})
+        return query_embedding, generation, cached
+    
+    async def _cache_response(
+        self,
+        query_embedding: np.ndarray,
+        rag_only: bool,
+        generation: int,
+        response: RAGResponse
+    ):
+        """Cache an answer unless the knowledge base changed while it was generated."""
+        current = await asyncio.to_thread(self.cache_generation.current)
+        # Checked and stored without awaiting, so a local clear can't land in between
+        if current == generation == self._seen_generation:
+            self.semantic_caches[rag_only].put(query_embedding, response)
+    
+    def clear_semantic_cache(self):
+        """Drop all cached answers in every worker (e.g. after the knowledge base changes)."""
+        if not self.semantic_caches:
+            return
+        for cache in self.semantic_caches.values():
+            cache.clear()
+        self._seen_generation = self.cache_generation.bump()
+    
+    def semantic_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Get combined semantic cache statistics, or None if caching is disabled."""
+        if not self.semantic_caches:
+            return None
+        
+        stats = [cache.stats() for cache in self.semantic_caches.values()]
+        hits = sum(s["hits"] for s in stats)
+        misses = sum(s["misses"] for s in stats)
+        return {
+            "entries": sum(s["entries"] for s in stats),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+    
     async def process_query(
         self,
         query: str,
@@ -330,33 +455,30 @@ class RAGGraph:
     ) -> RAGResponse:
         """Process a query through the RAG workflow."""
         try:
-            # Convert conversation history to dict format
-            history_dict = []
-            if conversation_history:
-                for msg in conversation_history:
-                    history_dict.append({
-                        "role": msg.role,
-                        "content": msg.content
-                    })
+            preflight = self._preflight(query)
+            if preflight is not None:
+                return preflight
+            
+            # Answers only depend on the query when there is no prior conversation
+            query_embedding = None
+            if self.semantic_caches and not conversation_history:
+                query_embedding, generation, cached = await asyncio.to_thread(
+                    self._lookup_cached_response, query, rag_only
+                )
+                if cached is not None:
+                    return cached
             
             # Initialize state
-            initial_state = RAGState(
-                query=query,
-                conversation_history=history_dict,
-                rag_only=rag_only
-            )
+            initial_state = self._initial_state(query, conversation_history, rag_only)
             
-            # Run the graph
-            final_state = self.graph.invoke(initial_state)
+            # Run the graph; sync nodes are executed in the default thread pool
+            final_state = await self.graph.ainvoke(initial_state)
             
             # Build response
-            response = RAGResponse(
-                answer=final_state.get("answer", ""),
-                citations=final_state.get("citations", []),
-                confidence=final_state.get("confidence", 0.0),
-                follow_up=final_state.get("follow_up"),
-                usage=TokenUsage(**final_state["usage"]) if final_state.get("usage") else None
-            )
+            response = self._build_response(final_state)
+            
+            if query_embedding is not None and not final_state.get("error") and response.confidence > 0:
+                await self._cache_response(query_embedding, rag_only, generation, response)
             
             return response
             
@@ -366,7 +488,109 @@ class RAGGraph:
                 answer="I encountered an error while processing your request. Please try again.",
                 confidence=0.0
             )
+    
+    async def stream_query(
+        self,
+        query: str,
+        conversation_history: Optional[List[ChatMessage]] = None,
+        rag_only: bool = True
+    ) -> AsyncIterator[Union[str, RAGResponse]]:
+        """Process a query, yielding answer tokens as they arrive.
+        
+        Runs the same steps as the graph, but streams the completion instead
+        of waiting for it. Yields ``str`` tokens followed by one final
+        ``RAGResponse`` carrying citations and follow-up.
+        """
+        settings = get_settings()
+        try:
+            preflight = self._preflight(query)
+            if preflight is not None:
+                yield preflight.answer
+                yield preflight
+                return
+            
+            state = self._initial_state(query, conversation_history, rag_only)
+            
+            query_embedding = None
+            if self.semantic_caches and not conversation_history:
+                query_embedding, generation, cached = await asyncio.to_thread(
+                    self._lookup_cached_response, query, rag_only
+                )
+                if cached is not None:
+                    yield cached.answer
+                    yield cached
+                    return
+            
+            state = await asyncio.to_thread(self._retrieve_node, state)
+            chunks = state["retrieved_chunks"]
+            
+            if state.get("error") or not chunks:
+                # No completion to stream; reuse the node's canned handling
+                state = await self._grounded_answer_node(state)
+                if self._after_answer(state) == "guardrails":
+                    state = self._guardrails_node(state)
+                state = self._finalize_node(state)
+                response = self._build_response(state)
+                yield response.answer
+                yield response
+                return
+            
+            prompt = build_rag_prompt(
+                query=query,
+                chunks=chunks,
+                conversation_history=state["conversation_history"],
+                rag_only=rag_only
+            )
+            
+            # The stream holds an LLM slot until the last token arrives
+            parts = []
+            async with self.llm_limiter.stream(
+                model=settings.azure_openai_deployment,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": f"Answer this question: {query}"}
+                ],
+                temperature=settings.temperature,
+                max_tokens=settings.max_tokens
+            ) as stream:
+                async for chunk in stream:
+                    # Azure sends a leading chunk with no choices (content filter results)
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        parts.append(token)
+                        yield token
+            
+            answer = "".join(parts)
+            state["answer"] = answer
+            state["citations"] = self._extract_citations(answer, chunks)
+            state["confidence"] = self._calculate_confidence(state["chunk_scores"], answer)
+            
+            state = self._finalize_node(self._guardrails_node(state))
+            response = self._build_response(state)
+            
+            if query_embedding is not None and not state.get("error") and response.confidence > 0:
+                await self._cache_response(query_embedding, rag_only, generation, response)
+            
+            yield response
+            
+        except Exception as e:
+            logger.error(f"RAG streaming error: {e}")
+            yield RAGResponse(
+                answer="I encountered an error while processing your request. Please try again.",
+                confidence=0.0
+            )
+
+
+# Global RAG graph instance, created on first use so importing this module
+# (or a uvicorn supervisor process) doesn't construct Azure clients
+_rag_graph: Optional[RAGGraph] = None
 
 
-# Global RAG graph instance
-rag_graph = RAGGraph()
+def get_rag_graph() -> RAGGraph:
+    """Get the process-wide RAG graph, creating it on first call."""
+    global _rag_graph
+    if _rag_graph is None:
+        _rag_graph = RAGGraph()
+    return _rag_graph
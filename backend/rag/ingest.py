@@ -1,19 +1,36 @@
 """Document ingestion and processing utilities."""
 
 import os
+import io
+import re
+import math
+import mmap
+import codecs
+import asyncio
 import logging
 import hashlib
 import mimetypes
-from typing import List, Dict, Any, Optional, Tuple
+import xxhash
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple, Union
 import uuid
 from datetime import datetime
-import aiofiles
 
 # Document processing imports
-import PyPDF2
-from docx import Document as DocxDocument
+import pypdfium2 as pdfium
+from lxml import etree
 from bs4 import BeautifulSoup
 import markdown
+import tiktoken
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
 
 # LangChain text splitters
 from langchain.text_splitter import (
@@ -22,23 +39,93 @@ from langchain.text_splitter import (
     TokenTextSplitter
 )
 
-from .settings import settings
+from .settings import get_settings
 from .models import DocumentInfo
-from .retriever import vector_store
+from .retriever import get_vector_store
 
 logger = logging.getLogger(__name__)
 
+# A file on disk, or the bytes of one small enough to keep in memory
+FileSource = Union[str, bytes]
+
+# Shared worker processes for CPU-bound parsing, created on first use
+_PROC_POOL: Optional[ProcessPoolExecutor] = None
+
+# Caps in-flight ingests so upload bursts queue instead of exhausting memory;
+# created on first use so importing this module doesn't load settings
+_INGEST_SEM: Optional[asyncio.Semaphore] = None
+
+
+def get_document_pool() -> ProcessPoolExecutor:
+    """Get the shared document parsing pool, creating it on first use."""
+    global _PROC_POOL
+    if _PROC_POOL is None:
+        # Each API worker gets its share of the cores
+        workers = max(1, (os.cpu_count() or 1) // max(get_settings().web_concurrency, 1))
+        _PROC_POOL = ProcessPoolExecutor(max_workers=workers)
+    return _PROC_POOL
+
+
+def _get_ingest_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent ingests, creating it on first use."""
+    global _INGEST_SEM
+    if _INGEST_SEM is None:
+        settings = get_settings()
+        # The cap is host-wide; each API worker enforces its share
+        total = settings.max_concurrent_ingests or math.ceil((os.cpu_count() or 1) * 1.5)
+        _INGEST_SEM = asyncio.Semaphore(max(1, math.ceil(total / max(settings.web_concurrency, 1))))
+    return _INGEST_SEM
+
+
+def shutdown_document_pool():
+    """Stop the document parsing pool, abandoning queued work."""
+    global _PROC_POOL
+    if _PROC_POOL is not None:
+        _PROC_POOL.shutdown(wait=False, cancel_futures=True)
+        _PROC_POOL = None
+
+_SPACE_RUN_RE = re.compile(r"[ \t]{2,}")
+
+# WordprocessingML element tags
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_T, _W_TBL, _W_TR, _W_TC = (f"{_W_NS}{name}" for name in ("p", "t", "tbl", "tr", "tc"))
+
+# Formats that need a dedicated extractor; anything else is chunked as streamed text
+_EXTRACTED_MIME_TYPES = frozenset((
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "text/html",
+))
+
+# Text files are decoded this many bytes at a time
+_TEXT_BLOCK_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def _get_encoding() -> tiktoken.Encoding:
+    """Tokenizer for chunk sizing, loaded (and possibly downloaded) on first use."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _token_length(text: str) -> int:
+    """Count the embedding-model tokens in a text."""
+    # Chunk sizes are measured in the embedding model's tokens
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+
+@dataclass(frozen=True)
+class IngestResult:
+    """Outcome of processing one file."""
+    doc_id: str
+    chunks: int
+    filename: str  # the stored document's filename
+    duplicate: bool = False  # an identical file was already ingested
+
 
 class DocumentProcessor:
     """Handles document ingestion, chunking, and processing."""
     
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
         self.markdown_splitter = MarkdownHeaderTextSplitter(
             headers_to_split_on=[
                 ("#", "Header 1"),
@@ -47,142 +134,252 @@ class DocumentProcessor:
             ]
         )
     
+    @cached_property
+    def text_splitter(self) -> RecursiveCharacterTextSplitter:
+        """Recursive splitter built from settings on first use."""
+        settings = get_settings()
+        # Sizes are in embedding-model tokens, not characters
+        return RecursiveCharacterTextSplitter(
+            chunk_size=settings.chunk_size_tokens,
+            chunk_overlap=settings.chunk_overlap_tokens,
+            separators=["\n\n", "\n", ". ", " ", ""],
+            length_function=_token_length
+        )
+    
     async def process_file(
         self,
-        file_path: str,
+        file_source: FileSource,
         filename: str,
         mime_type: str,
-        tags: Optional[List[str]] = None
-    ) -> Tuple[str, int]:
-        """Process a file and add it to the vector store."""
-        try:
-            # Generate document ID
-            doc_id = str(uuid.uuid4())
-            
-            # Read and extract text from file
-            text_content = await self._extract_text(file_path, mime_type)
-            
-            if not text_content.strip():
-                raise ValueError("No text content extracted from file")
-            
-            # Chunk the text
-            chunks = self._chunk_text(text_content, filename, mime_type)
-            
-            if not chunks:
-                raise ValueError("No chunks generated from text content")
-            
-            # Get file size
-            file_size = os.path.getsize(file_path)
-            
-            # Prepare metadata
-            metadata = {
-                "filename": filename,
-                "mime_type": mime_type,
-                "file_size": file_size,
-                "tags": tags or [],
-                "content_hash": hashlib.md5(text_content.encode()).hexdigest(),
-                "processing_timestamp": datetime.utcnow().isoformat()
-            }
-            
-            # Add to vector store
-            chunks_added = vector_store.add_document(
-                doc_id=doc_id,
-                filename=filename,
-                chunks=chunks,
-                metadata=metadata
+        tags: Optional[List[str]] = None,
+        executor: Optional[Executor] = None,
+        file_hash: Optional[str] = None
+    ) -> IngestResult:
+        """Process a file and add it to the vector store.
+        
+        ``file_source`` is a path, or the file's bytes for uploads small
+        enough to keep in memory. Parsing and chunking are CPU-bound and run
+        in ``executor`` (the shared document pool by default); embedding and
+        storage stay in this process. At most ``max_concurrent_ingests`` files
+        are processed at once; further calls wait their turn.
+        
+        Re-uploading a file whose sha256 ``file_hash`` is already stored
+        returns the existing document, marked as a duplicate and with its
+        stored filename, instead of ingesting it again.
+        """
+        if executor is None:
+            executor = get_document_pool()
+        
+        async with _get_ingest_semaphore():
+            try:
+                loop = asyncio.get_running_loop()
+                
+                # Skip exact duplicate uploads before doing any parsing
+                if file_hash is None:
+                    file_hash = await loop.run_in_executor(executor, _hash_file, file_source)
+                existing = await asyncio.to_thread(get_vector_store().find_document_by_hash, file_hash)
+                if existing:
+                    logger.info(f"File {filename} is a duplicate of document {existing['doc_id']}, skipping")
+                    return IngestResult(
+                        doc_id=existing["doc_id"],
+                        chunks=existing.get("total_chunks", 0),
+                        filename=existing.get("filename", filename),
+                        duplicate=True
+                    )
+                
+                # Generate document ID
+                doc_id = str(uuid.uuid4())
+                
+                # Parse off the event loop, stat'ing the file alongside
+                if isinstance(file_source, bytes):
+                    file_size = len(file_source)
+                    content_hash, chunks = await self._parse_file(file_source, filename, mime_type, executor)
+                else:
+                    (content_hash, chunks), file_size = await asyncio.gather(
+                        self._parse_file(file_source, filename, mime_type, executor),
+                        asyncio.to_thread(os.path.getsize, file_source)
+                    )
+                
+                # Prepare metadata
+                metadata = {
+                    "filename": filename,
+                    "mime_type": mime_type,
+                    "file_size": file_size,
+                    "tags": tags or [],
+                    "content_xxh3": content_hash,
+                    "file_hash": file_hash,
+                    "processing_timestamp": datetime.utcnow().isoformat()
+                }
+                
+                # Add to vector store
+                chunks_added = await get_vector_store().add_document(
+                    doc_id=doc_id,
+                    filename=filename,
+                    chunks=chunks,
+                    metadata=metadata
+                )
+                
+                logger.info(f"Processed file {filename}: {chunks_added} chunks added")
+                return IngestResult(doc_id=doc_id, chunks=chunks_added, filename=filename)
+                
+            except Exception as e:
+                logger.error(f"Failed to process file {filename}: {e}")
+                raise
+    
+    async def _parse_file(
+        self,
+        file_source: FileSource,
+        filename: str,
+        mime_type: str,
+        executor: Optional[Executor] = None
+    ) -> Tuple[str, List[str]]:
+        """Extract, hash and chunk a file in ``executor``; returns (content_hash, chunks)."""
+        loop = asyncio.get_running_loop()
+        
+        if mime_type == "application/pdf" and isinstance(file_source, str):
+            # Fan page ranges out across the pool, then chunk the joined text.
+            # In-memory PDFs are small, so they go to a single task instead of
+            # shipping the bytes to every range.
+            text_content = await self._extract_pdf_text_parallel(file_source, executor)
+            return await loop.run_in_executor(
+                executor, _chunk_document, text_content, filename, mime_type
             )
-            
-            logger.info(f"Processed file {filename}: {chunks_added} chunks added")
-            return doc_id, chunks_added
-            
-        except Exception as e:
-            logger.error(f"Failed to process file {filename}: {e}")
-            raise
+        
+        return await loop.run_in_executor(
+            executor, _parse_document, file_source, filename, mime_type
+        )
     
-    async def _extract_text(self, file_path: str, mime_type: str) -> str:
+    def _extract_text(self, file_source: FileSource, mime_type: str) -> str:
         """Extract text content from a file based on its MIME type."""
         try:
             if mime_type == "application/pdf":
-                return await self._extract_pdf_text(file_path)
+                return self._extract_pdf_text(file_source)
             elif mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                return await self._extract_docx_text(file_path)
+                return self._extract_docx_text(file_source)
             elif mime_type in ["text/plain", "text/markdown"]:
-                return await self._extract_text_file(file_path)
+                return self._extract_text_file(file_source)
             elif mime_type == "text/html":
-                return await self._extract_html_text(file_path)
+                return self._extract_html_text(file_source)
             else:
                 # Try to read as plain text
-                return await self._extract_text_file(file_path)
+                return self._extract_text_file(file_source)
                 
         except Exception as e:
-            logger.error(f"Failed to extract text from {file_path}: {e}")
+            logger.error(f"Failed to extract text ({mime_type}): {e}")
             raise
     
-    async def _extract_pdf_text(self, file_path: str) -> str:
+    def _extract_pdf_text(self, file_source: FileSource) -> str:
         """Extract text from PDF file."""
-        text_content = []
+        return "\n\n".join(_extract_pages(file_source, 0, None))
+    
+    async def _extract_pdf_text_parallel(
+        self,
+        file_path: str,
+        executor: Optional[Executor] = None
+    ) -> str:
+        """Extract text from a PDF, one page range per executor task."""
+        settings = get_settings()
+        loop = asyncio.get_running_loop()
+        page_count = await loop.run_in_executor(executor, _count_pdf_pages, file_path)
         
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_content.append(f"=== Page {page_num + 1} ===\n{page_text}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num + 1}: {e}")
-                    continue
+        batch = settings.pdf_pages_per_task
+        ranges = [(start, min(start + batch, page_count)) for start in range(0, page_count, batch)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, _extract_pages, file_path, start, end)
+            for start, end in ranges
+        ))
         
-        return "\n\n".join(text_content)
+        logger.debug(f"Extracted {page_count} PDF pages in {len(ranges)} tasks")
+        return "\n\n".join(page for pages in results for page in pages)
     
-    async def _extract_docx_text(self, file_path: str) -> str:
-        """Extract text from DOCX file."""
-        doc = DocxDocument(file_path)
-        text_content = []
+    def _extract_docx_text(self, file_source: FileSource) -> str:
+        """Extract text from DOCX file.
         
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_content.append(paragraph.text)
+        Streams word/document.xml in a single pass instead of building the
+        python-docx object model. Paragraphs and table rows come out in
+        document order; table rows are rendered as "cell | cell".
+        """
+        text_content = []
+        table_depth = 0
         
-        # Extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    if cell.text.strip():
-                        row_text.append(cell.text.strip())
-                if row_text:
-                    text_content.append(" | ".join(row_text))
+        archive_file = io.BytesIO(file_source) if isinstance(file_source, bytes) else file_source
+        with zipfile.ZipFile(archive_file) as archive, archive.open("word/document.xml") as xml_file:
+            for event, element in etree.iterparse(xml_file, events=("start", "end"), tag=(_W_TBL, _W_TR, _W_P)):
+                if element.tag == _W_TBL:
+                    table_depth += 1 if event == "start" else -1
+                    continue
+                if event != "end":
+                    continue
+                
+                if element.tag == _W_TR:
+                    cells = (
+                        "".join(t.text or "" for t in cell.iter(_W_T)).strip()
+                        for cell in element.iterchildren(_W_TC)
+                    )
+                    row_text = [cell for cell in cells if cell]
+                    if row_text:
+                        text_content.append(" | ".join(row_text))
+                elif table_depth == 0:
+                    # Runs split words arbitrarily, so join them without separators
+                    paragraph = "".join(t.text or "" for t in element.iter(_W_T))
+                    if paragraph.strip():
+                        text_content.append(paragraph)
+                else:
+                    # Paragraphs inside tables are read with their row
+                    continue
+                
+                # Free parsed elements as we go
+                element.clear()
+                if table_depth == 0:
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
         
         return "\n\n".join(text_content)
     
-    async def _extract_text_file(self, file_path: str) -> str:
+    def _extract_text_file(self, file_source: FileSource) -> str:
         """Extract text from plain text or markdown file."""
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as file:
-            return await file.read()
+        if isinstance(file_source, bytes):
+            return file_source.decode('utf-8')
+        with open(file_source, 'r', encoding='utf-8') as file:
+            return file.read()
     
-    async def _extract_html_text(self, file_path: str) -> str:
+    def _extract_html_text(self, file_source: FileSource) -> str:
         """Extract text from HTML file."""
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as file:
-            html_content = await file.read()
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
+        html_content = self._extract_text_file(file_source)
         
-        # Get text and clean it up
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+        if HTMLParser is not None:
+            tree = HTMLParser(html_content)
+            
+            # Remove script and style elements
+            for node in tree.css("script, style"):
+                node.decompose()
+            
+            root = tree.body or tree.root
+            text = root.text(separator="\n") if root is not None else ""
+        else:
+            # Fall back to BeautifulSoup on the lxml parser
+            soup = BeautifulSoup(html_content, 'lxml')
+            for script in soup(["script", "style"]):
+                script.decompose()
+            text = soup.get_text(separator="\n")
         
-        return text
+        # Collapse runs of spaces and drop blank lines
+        text = _SPACE_RUN_RE.sub(" ", text)
+        return "\n".join(filter(None, map(str.strip, text.split("\n"))))
     
     def _chunk_text(self, text: str, filename: str, mime_type: str) -> List[str]:
         """Chunk text content into smaller pieces."""
+        return self._merge_small_chunks(self._split_text(text, filename, mime_type))
+    
+    def _chunk_text_stream(self, segments: Iterable[str], filename: str, mime_type: str) -> List[str]:
+        """Chunk text that arrives as a sequence of paragraph-aligned segments."""
+        return self._merge_small_chunks(
+            chunk for segment in segments for chunk in self._split_text(segment, filename, mime_type)
+        )
+    
+    def _split_text(self, text: str, filename: str, mime_type: str) -> List[str]:
+        """Split text into chunks, before small chunks are merged."""
+        settings = get_settings()
         try:
             # For Markdown files, try to split by headers first
             if mime_type == "text/markdown" or filename.endswith('.md'):
@@ -193,7 +390,7 @@ class DocumentProcessor:
                         all_chunks = []
                         for chunk in md_chunks:
                             chunk_text = chunk.page_content if hasattr(chunk, 'page_content') else str(chunk)
-                            if len(chunk_text) > settings.chunk_size:
+                            if _token_length(chunk_text) > settings.chunk_size_tokens:
                                 sub_chunks = self.text_splitter.split_text(chunk_text)
                                 all_chunks.extend(sub_chunks)
                             else:
@@ -203,29 +400,52 @@ class DocumentProcessor:
                     logger.warning(f"Markdown splitting failed for {filename}: {e}")
             
             # Default recursive splitting
-            chunks = self.text_splitter.split_text(text)
-            
-            # Filter out very short chunks
-            filtered_chunks = [
-                chunk for chunk in chunks 
-                if len(chunk.strip()) > 50  # Minimum chunk length
-            ]
-            
-            return filtered_chunks
+            return self.text_splitter.split_text(text)
             
         except Exception as e:
             logger.error(f"Failed to chunk text for {filename}: {e}")
             raise
     
+    def _merge_small_chunks(self, chunks: Iterable[str]) -> List[str]:
+        """Fold chunks under min_chunk_tokens into an adjacent chunk.
+        
+        Small pieces (short sections, trailing fragments) are merged with their
+        predecessor as long as the result stays within chunk_size_tokens, rather
+        than being dropped.
+        """
+        settings = get_settings()
+        merged: List[str] = []
+        lengths: List[int] = []
+        
+        for chunk in chunks:
+            chunk = chunk.strip()
+            if not chunk:
+                continue
+            
+            length = _token_length(chunk)
+            if (
+                merged
+                and min(lengths[-1], length) < settings.min_chunk_tokens
+                and lengths[-1] + length <= settings.chunk_size_tokens
+            ):
+                merged[-1] = f"{merged[-1]}\n\n{chunk}"
+                lengths[-1] += length
+            else:
+                merged.append(chunk)
+                lengths.append(length)
+        
+        return merged
+    
     def validate_file(self, filename: str, file_size: int, mime_type: str) -> Tuple[bool, str]:
         """Validate uploaded file against constraints."""
+        settings = get_settings()
         # Check file size
         if file_size > settings.max_file_size:
             return False, f"File size ({file_size} bytes) exceeds maximum allowed ({settings.max_file_size} bytes)"
         
         # Check MIME type
         if mime_type not in settings.allowed_mime_types:
-            return False, f"File type '{mime_type}' is not allowed. Allowed types: {', '.join(settings.allowed_mime_types)}"
+            return False, f"File type '{mime_type}' is not allowed. Allowed types: {', '.join(sorted(settings.allowed_mime_types))}"
         
         # Check filename
         if not filename or filename.startswith('.'):
@@ -233,8 +453,8 @@ class DocumentProcessor:
         
         return True, "File is valid"
     
-    def detect_mime_type(self, filename: str, file_path: str) -> str:
-        """Detect MIME type of a file."""
+    def detect_mime_type(self, filename: str, file_path: str, head: bytes = b"") -> str:
+        """Detect MIME type of a file, from its path or the first bytes of its content."""
         # First try to guess from filename
         mime_type, _ = mimetypes.guess_type(filename)
         
@@ -245,7 +465,7 @@ class DocumentProcessor:
         try:
             import magic
             mime = magic.Magic(mime=True)
-            detected_mime = mime.from_file(file_path)
+            detected_mime = mime.from_buffer(head[:2048]) if head else mime.from_file(file_path)
             if detected_mime:
                 return detected_mime
         except ImportError:
@@ -269,3 +489,137 @@ class DocumentProcessor:
 
 # Global document processor instance
 document_processor = DocumentProcessor()
+
+
+def _hash_file(file_source: FileSource) -> str:
+    """Return the sha256 hex digest of a file's bytes."""
+    if isinstance(file_source, bytes):
+        return hashlib.sha256(file_source).hexdigest()
+    
+    digest = hashlib.sha256()
+    with open(file_source, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    with closing(pdfium.PdfDocument(file_path)) as doc:
+        return len(doc)
+
+
+def _page_text(doc: "pdfium.PdfDocument", page_num: int) -> str:
+    """Extract the text of one page, releasing PDFium's page handles."""
+    with closing(doc[page_num]) as page, closing(page.get_textpage()) as textpage:
+        # PDFium separates lines with CRLF
+        return textpage.get_text_bounded().replace("\r\n", "\n")
+
+
+def _extract_pages(file_source: FileSource, start: int, end: Optional[int]) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF.
+    
+    Module-level so it can run in a worker process; PDFium documents aren't
+    picklable, so each task opens the file (or bytes) itself.
+    """
+    text_content = []
+    
+    with closing(pdfium.PdfDocument(file_source)) as doc:
+        for page_num in range(start, len(doc) if end is None else end):
+            try:
+                page_text = _page_text(doc, page_num)
+                if page_text.strip():
+                    text_content.append(f"=== Page {page_num + 1} ===\n{page_text}")
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {e}")
+                continue
+    
+    return text_content
+
+
+def _chunk_document(text_content: str, filename: str, mime_type: str) -> Tuple[str, List[str]]:
+    """Hash and chunk extracted text; module-level so it can run in a worker process.
+    
+    Returns (content_hash, chunks), so the full text never has to be sent
+    back to the parent process.
+    """
+    if not text_content.strip():
+        raise ValueError("No text content extracted from file")
+    
+    chunks = document_processor._chunk_text(text_content, filename, mime_type)
+    
+    if not chunks:
+        raise ValueError("No chunks generated from text content")
+    
+    return xxhash.xxh3_64_hexdigest(text_content.encode()), chunks
+
+
+def _iter_text_blocks(data: memoryview) -> Iterator[str]:
+    """Decode UTF-8 bytes one block at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(data), _TEXT_BLOCK_SIZE):
+        yield decoder.decode(data[start:start + _TEXT_BLOCK_SIZE])
+    yield decoder.decode(b"", final=True)
+
+
+def _iter_text_segments(blocks: Iterable[str], max_pending: int = _TEXT_BLOCK_SIZE) -> Iterator[str]:
+    """Regroup decoded blocks into segments that end on a paragraph (or line) break.
+    
+    Text without line breaks (minified or single-line logs) is cut at the
+    last space, or hard at ``max_pending`` characters, so the carried-over
+    remainder never grows past about one block.
+    """
+    pending = ""
+    for block in blocks:
+        pending += block
+        for separator in ("\n\n", "\n", " "):
+            cut = pending.rfind(separator)
+            if cut != -1:
+                yield pending[:cut]
+                pending = pending[cut + len(separator):]
+                break
+        else:
+            if len(pending) >= max_pending:
+                yield pending
+                pending = ""
+    if pending:
+        yield pending
+
+
+def _chunk_text_buffer(data: Any, filename: str, mime_type: str) -> Tuple[str, List[str]]:
+    """Hash and chunk UTF-8 text held in a buffer (bytes or an mmap)."""
+    with memoryview(data) as view:
+        segments = _iter_text_segments(_iter_text_blocks(view))
+        chunks = document_processor._chunk_text_stream(segments, filename, mime_type)
+        content_hash = xxhash.xxh3_64_hexdigest(view)
+    
+    if not chunks:
+        raise ValueError("No text content extracted from file")
+    
+    return content_hash, chunks
+
+
+def _parse_text_file(file_source: FileSource, filename: str, mime_type: str) -> Tuple[str, List[str]]:
+    """Hash and chunk a plain text file; module-level so it can run in a worker process.
+    
+    Files on disk are memory-mapped and decoded a block at a time, and the
+    splitter works segment by segment, so the full text is never held as a
+    single string.
+    """
+    if isinstance(file_source, bytes):
+        return _chunk_text_buffer(file_source, filename, mime_type)
+    
+    with open(file_source, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError("No text content extracted from file")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _chunk_text_buffer(mapped, filename, mime_type)
+
+
+def _parse_document(file_source: FileSource, filename: str, mime_type: str) -> Tuple[str, List[str]]:
+    """Extract, hash and chunk a file; module-level so it can run in a worker process."""
+    if mime_type not in _EXTRACTED_MIME_TYPES:
+        return _parse_text_file(file_source, filename, mime_type)
+    
+    text_content = document_processor._extract_text(file_source, mime_type)
+    return _chunk_document(text_content, filename, mime_type)
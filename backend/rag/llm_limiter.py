@@ -0,0 +1,40 @@
+"""Concurrency limiting for Azure OpenAI chat completions."""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from openai import AsyncAzureOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class LLMLimiter:
+    """Bounds the number of in-flight chat-completion calls.
+
+    Azure OpenAI chat deployments accept one conversation per request, so
+    there is nothing to gain from holding calls back to group them; each call
+    is sent as soon as a slot is free. ``max_concurrency`` makes bursts queue
+    here instead of tripping the deployment's rate limits. A streamed call
+    holds its slot until the stream is closed, not just until it starts.
+    """
+
+    def __init__(self, client: AsyncAzureOpenAI, max_concurrency: int = 32):
+        self.client = client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def submit(self, **params: Any) -> Any:
+        """Make a ``chat.completions.create`` call once a slot is free."""
+        async with self._semaphore:
+            return await self.client.chat.completions.create(**params)
+
+    @asynccontextmanager
+    async def stream(self, **params: Any) -> AsyncIterator[Any]:
+        """Open a streamed ``chat.completions.create`` call once a slot is free.
+
+        The slot is released, and the stream closed, when the block exits.
+        """
+        async with self._semaphore:
+            async with await self.client.chat.completions.create(stream=True, **params) as stream:
+                yield stream
@@ -1,6 +1,6 @@
 """Pydantic models for API requests and responses."""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 import uuid
@@ -68,6 +68,7 @@ class UploadResponse(BaseModel):
     filename: str
     chunks: int
     message: str = "Document uploaded successfully"
+    duplicate: bool = False
 
 
 class DeleteResponse(BaseModel):
@@ -92,6 +93,7 @@ class HealthResponse(BaseModel):
     version: str = "1.0.0"
     timestamp: datetime
     services: Dict[str, str] = {}
+    semantic_cache: Optional[Dict[str, Any]] = None
 
 
 class ErrorResponse(BaseModel):
@@ -104,6 +106,8 @@ class ErrorResponse(BaseModel):
 # Internal models for RAG processing
 class RetrievedChunk(BaseModel):
     """A retrieved chunk from the vector store."""
+    model_config = ConfigDict(frozen=True)
+
     doc_id: str
     filename: str
     chunk_index: int
@@ -68,24 +68,35 @@ RAG-only mode: {rag_only}
 Classify this message and explain your reasoning."""
 
 
+# Fixed pieces of the RAG prompt, built once
+_CHUNK_FMT = (
+    "Chunk {i}:\n"
+    "- Document: {filename}\n"
+    "- Doc ID: {doc_id}\n"
+    "- Chunk Index: {chunk_index}\n"
+    "- Relevance Score: {score:.3f}\n"
+    "- Content: {content}"
+)
+_RAG_PROMPT_HEADER = f"{SYSTEM_PROMPT_ASSISTANT}\n\n"
+_RAG_PROMPT_FOOTER = "\n\nBased on the retrieved chunks above, provide a comprehensive answer with proper citations."
+
+
 def format_chunks_for_prompt(chunks: List[Dict[str, Any]]) -> str:
     """Format retrieved chunks for inclusion in prompts."""
     if not chunks:
         return "No relevant chunks found in the knowledge base."
     
-    formatted_chunks = []
-    for i, chunk in enumerate(chunks, 1):
-        chunk_text = f"""
-Chunk {i}:
-- Document: {chunk.get('filename', 'Unknown')}
-- Doc ID: {chunk.get('doc_id', 'Unknown')}
-- Chunk Index: {chunk.get('chunk_index', 0)}
-- Relevance Score: {chunk.get('score', 0.0):.3f}
-- Content: {chunk.get('content', '')}
-"""
-        formatted_chunks.append(chunk_text.strip())
-    
-    return "\n\n".join(formatted_chunks)
+    return "\n\n".join(
+        _CHUNK_FMT.format(
+            i=i,
+            filename=chunk.get('filename', 'Unknown'),
+            doc_id=chunk.get('doc_id', 'Unknown'),
+            chunk_index=chunk.get('chunk_index', 0),
+            score=chunk.get('score', 0.0),
+            content=chunk.get('content', '')
+        ).rstrip()
+        for i, chunk in enumerate(chunks, 1)
+    )
 
 
 def format_conversation_history(messages: List[Dict[str, str]], max_messages: int = 10) -> str:
@@ -94,15 +105,10 @@ def format_conversation_history(messages: List[Dict[str, str]], max_messages: in
         return "No conversation history."
     
     # Take the last max_messages messages
-    recent_messages = messages[-max_messages:]
-    
-    formatted = []
-    for msg in recent_messages:
-        role = msg.get('role', 'unknown')
-        content = msg.get('content', '')
-        formatted.append(f"{role.title()}: {content}")
-    
-    return "\n".join(formatted)
+    return "\n".join(
+        f"{msg.get('role', 'unknown').title()}: {msg.get('content', '')}"
+        for msg in messages[-max_messages:]
+    )
 
 
 def build_rag_prompt(
@@ -112,30 +118,19 @@ def build_rag_prompt(
     rag_only: bool = True
 ) -> str:
     """Build the complete RAG prompt with context."""
-    
-    system_prompt = SYSTEM_PROMPT_ASSISTANT
+    parts = [_RAG_PROMPT_HEADER]
     
     # Add conversation context if available
-    context_section = ""
     if conversation_history:
-        context_section = f"""
-Conversation History:
-{format_conversation_history(conversation_history)}
-
-"""
-    
-    # Format retrieved chunks
-    chunks_section = f"""
-Retrieved Knowledge Base Chunks:
-{format_chunks_for_prompt(chunks)}
-
-"""
+        parts += ("\nConversation History:\n", format_conversation_history(conversation_history), "\n\n")
     
-    # Build the complete prompt
-    full_prompt = f"""{system_prompt}
-
-{context_section}{chunks_section}Current User Question: {query}
-
-Based on the retrieved chunks above, provide a comprehensive answer with proper citations."""
+    # Retrieved chunks, then the question
+    parts += (
+        "\nRetrieved Knowledge Base Chunks:\n",
+        format_chunks_for_prompt(chunks),
+        "\n\nCurrent User Question: ",
+        query,
+        _RAG_PROMPT_FOOTER
+    )
     
-    return full_prompt.strip()
+    return "".join(parts)
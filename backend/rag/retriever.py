@@ -1,21 +1,63 @@
 """Vector store and retrieval functionality using ChromaDB."""
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 import openai
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
+import numpy as np
 import hashlib
+import xxhash
 import uuid
 from datetime import datetime
 
-from .settings import settings
+from .settings import get_settings
 from .models import RetrievedChunk, DocumentInfo
+from .embed_cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+# Azure OpenAI rejects embedding requests with more inputs than this
+MAX_EMBED_INPUTS = 2048
+
+# Fallback cap on records per Chroma write (its SQLite bound-parameter limit)
+MAX_CHROMA_BATCH = 5000
+
+# Chroma collection holding the chunks
+CHUNK_COLLECTION = "kb_default"
+
+# Document records carry no vector of their own
+DOCUMENT_PLACEHOLDER_EMBEDDING = [0.0]
+
+# Per-chunk fields that don't belong in a document record
+CHUNK_ONLY_FIELDS = ("chunk_index", "chunk_id", "content_hash", "content_xxh3", "h")
+
+
+def _content_hash(text: str) -> int:
+    """Return the xxh3-64 hash of a chunk as a signed int64 (Chroma's int type)."""
+    value = xxhash.xxh3_64_intdigest(text.encode())
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+@dataclass(slots=True)
+class _DocAgg:
+    """Per-document aggregate built while scanning chunk metadata."""
+    first_meta: Dict[str, Any]
+    chunks: int = 1
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Return the document record, without per-chunk fields."""
+        record = {k: v for k, v in self.first_meta.items() if k not in CHUNK_ONLY_FIELDS}
+        record["total_chunks"] = self.chunks
+        return record
+
 
 class VectorStore:
     """ChromaDB vector store for document retrieval."""
@@ -23,16 +65,61 @@ class VectorStore:
     def __init__(self):
         self.client = None
         self.collection = None
+        self.documents = None
         self.openai_client = None
+        self.async_openai_client = None
+        self.embed_cache = None
+        self._query_cache: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._filenames: Dict[str, str] = {}
         self._initialize()
     
     def _initialize(self):
-        """Initialize ChromaDB client and collection."""
+        """Initialize the index and the embedding clients."""
+        settings = get_settings()
         try:
+            self._init_index()
+            
+            # Initialize Azure OpenAI clients (sync for queries, async for ingestion)
+            self.openai_client = AzureOpenAI(
+                api_key=settings.azure_openai_api_key,
+                api_version=settings.azure_openai_api_version,
+                azure_endpoint=settings.azure_openai_endpoint
+            )
+            self.async_openai_client = AsyncAzureOpenAI(
+                api_key=settings.azure_openai_api_key,
+                api_version=settings.azure_openai_api_version,
+                azure_endpoint=settings.azure_openai_endpoint
+            )
+            
+            # Embeddings survive restarts in a local SQLite cache
+            if settings.embed_cache_enabled:
+                self.embed_cache = EmbeddingCache(
+                    path=settings.embed_cache_path,
+                    model=settings.azure_openai_embed_deployment,
+                    max_entries=settings.embed_cache_max_entries
+                )
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize vector store: {e}")
+            raise
+    
+    def _init_index(self):
+        """Initialize ChromaDB client and collection."""
+        settings = get_settings()
+        # Initialize ChromaDB client; a Chroma server lets several API
+        # worker processes share one index
+        if settings.chroma_host:
+            self.client = chromadb.HttpClient(
+                host=settings.chroma_host,
+                port=settings.chroma_port,
+                settings=ChromaSettings(anonymized_telemetry=False)
+            )
+        else:
             # Ensure the data directory exists
             os.makedirs(settings.chroma_persist_directory, exist_ok=True)
             
-            # Initialize ChromaDB client
             self.client = chromadb.PersistentClient(
                 path=settings.chroma_persist_directory,
                 settings=ChromaSettings(
@@ -40,43 +127,147 @@ class VectorStore:
                     allow_reset=True
                 )
             )
-            
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name="kb_default",
-                metadata={"description": "Knowledge base documents"}
-            )
-            
-            # Initialize Azure OpenAI client
-            self.openai_client = AzureOpenAI(
-                api_key=settings.azure_openai_api_key,
-                api_version=settings.azure_openai_api_version,
-                azure_endpoint=settings.azure_openai_endpoint
+        
+        # Scores are cosine similarities on both backends
+        self.collection = self._open_chunk_collection()
+        # Collections created before the space was set use Chroma's default squared L2
+        self._distance_space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        
+        # One record per document; Chroma requires an embedding, so use a 1-d placeholder
+        self.documents = self.client.get_or_create_collection(
+            name="kb_documents_meta",
+            metadata={"description": "Knowledge base document records"}
+        )
+        if self.documents.count() == 0 and self.collection.count() > 0:
+            self._backfill_documents()
+        
+        logger.info(f"Initialized ChromaDB with {self.collection.count()} chunks in {self.documents.count()} documents")
+    
+    def _open_chunk_collection(self):
+        """Open the chunk collection, creating it in the cosine space if it doesn't exist.
+        
+        get_or_create_collection would overwrite an existing collection's
+        metadata, labelling an L2 index "cosine" without changing its space.
+        """
+        if any(collection.name == CHUNK_COLLECTION for collection in self.client.list_collections()):
+            return self.client.get_collection(name=CHUNK_COLLECTION)
+        try:
+            return self.client.create_collection(
+                name=CHUNK_COLLECTION,
+                metadata={"description": "Knowledge base documents", "hnsw:space": "cosine"}
             )
+        except Exception:
+            # Another worker created it first
+            return self.client.get_collection(name=CHUNK_COLLECTION)
+    
+    def _lookup_cached(self, texts: List[str]) -> Tuple[List[Any], List[int]]:
+        """Return cached embeddings (None for misses) and the indices of misses."""
+        if self.embed_cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        
+        cached = self.embed_cache.get_many(texts)
+        return cached, [i for i, vec in enumerate(cached) if vec is None]
+    
+    def _merge_fresh(
+        self,
+        texts: List[str],
+        cached: List[Any],
+        missing: List[int],
+        fresh: List[List[float]]
+    ) -> List[List[float]]:
+        """Fill misses with fresh embeddings and write them back to the cache."""
+        if self.embed_cache is not None and missing:
+            self.embed_cache.put_many([texts[i] for i in missing], fresh)
+        for i, vec in zip(missing, fresh):
+            cached[i] = vec
+        
+        logger.debug(f"Embedding cache served {len(texts) - len(missing)}/{len(texts)} texts")
+        return [vec if isinstance(vec, list) else vec.tolist() for vec in cached]
+    
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings, serving what it can from the persistent cache."""
+        cached, missing = self._lookup_cached(texts)
+        fresh = self._request_embeddings([texts[i] for i in missing]) if missing else []
+        return self._merge_fresh(texts, cached, missing, fresh)
+    
+    async def _aget_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of _get_embeddings for bulk ingestion."""
+        # Cache reads and writes hash every text and hit SQLite; keep them off the event loop
+        cached, missing = await asyncio.to_thread(self._lookup_cached, texts)
+        fresh = await self._arequest_embeddings([texts[i] for i in missing]) if missing else []
+        return await asyncio.to_thread(self._merge_fresh, texts, cached, missing, fresh)
+    
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings from Azure OpenAI, one request per MAX_EMBED_INPUTS texts."""
+        settings = get_settings()
+        try:
+            embeddings = []
+            for start in range(0, len(texts), MAX_EMBED_INPUTS):
+                response = self.openai_client.embeddings.create(
+                    input=texts[start:start + MAX_EMBED_INPUTS],
+                    model=settings.azure_openai_embed_deployment
+                )
+                # Results carry their input index; don't rely on response order
+                embeddings.extend(data.embedding for data in sorted(response.data, key=lambda d: d.index))
             
-            logger.info(f"Initialized ChromaDB with {self.collection.count()} documents")
+            logger.debug(f"Generated {len(embeddings)} embeddings")
+            return embeddings
             
         except Exception as e:
-            logger.error(f"Failed to initialize vector store: {e}")
+            logger.error(f"Failed to generate embeddings: {e}")
             raise
     
-    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings from Azure OpenAI."""
+    async def _arequest_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings from Azure OpenAI in concurrent fixed-size batches."""
+        settings = get_settings()
+        batch_size = min(settings.embed_batch_size, MAX_EMBED_INPUTS)
+        semaphore = asyncio.Semaphore(settings.embed_max_concurrency)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                response = await self.async_openai_client.embeddings.create(
+                    input=batch,
+                    model=settings.azure_openai_embed_deployment
+                )
+            # Results carry their input index; don't rely on response order
+            return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+        
         try:
-            response = self.openai_client.embeddings.create(
-                input=texts,
-                model=settings.azure_openai_embed_deployment
-            )
+            batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
             
-            embeddings = [data.embedding for data in response.data]
-            logger.debug(f"Generated {len(embeddings)} embeddings")
+            embeddings = [embedding for batch in results for embedding in batch]
+            logger.debug(f"Generated {len(embeddings)} embeddings in {len(batches)} batches")
             return embeddings
             
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {e}")
             raise
     
-    def add_document(
+    def _embed(self, text: str) -> np.ndarray:
+        """Embed a single query string, memoized per (deployment, sha1(text))."""
+        settings = get_settings()
+        # Hash the key so long queries don't bloat the cache
+        key = (settings.azure_openai_embed_deployment, hashlib.sha1(text.encode()).digest())
+        
+        with self._query_cache_lock:
+            embedding = self._query_cache.get(key)
+            if embedding is not None:
+                self._query_cache.move_to_end(key)
+                return embedding
+        
+        embedding = np.asarray(self._get_embeddings([text])[0], dtype=np.float32)
+        # Cached arrays are shared between callers
+        embedding.setflags(write=False)
+        
+        with self._query_cache_lock:
+            self._query_cache[key] = embedding
+            if len(self._query_cache) > settings.query_embed_cache_size:
+                self._query_cache.popitem(last=False)
+        
+        return embedding
+    
+    async def add_document(
         self,
         doc_id: str,
         filename: str,
@@ -89,40 +280,38 @@ class VectorStore:
                 logger.warning(f"No chunks provided for document {doc_id}")
                 return 0
             
-            # Generate embeddings for all chunks
-            embeddings = self._get_embeddings(chunks)
+            # Embed each distinct chunk once; repeats reuse the same vector
+            unique_chunks = list(dict.fromkeys(chunks))
+            vectors = dict(zip(unique_chunks, await self._aget_embeddings(unique_chunks)))
+            embeddings = [vectors[chunk] for chunk in chunks]
+            if len(unique_chunks) < len(chunks):
+                logger.debug(f"Skipped {len(chunks) - len(unique_chunks)} duplicate chunks for {doc_id}")
             
-            # Prepare chunk IDs and metadata
-            chunk_ids = []
-            chunk_metadata = []
-            
-            base_metadata = metadata or {}
-            base_metadata.update({
+            # Document-level fields are stored once, in the documents side table
+            document_record = dict(metadata or {})
+            document_record.update({
                 "doc_id": doc_id,
                 "filename": filename,
-                "uploaded_at": datetime.utcnow().isoformat(),
+                "uploaded_at": int(time.time()),
                 "total_chunks": len(chunks)
             })
             
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc_id}_{i}"
-                chunk_ids.append(chunk_id)
-                
-                chunk_meta = base_metadata.copy()
-                chunk_meta.update({
-                    "chunk_index": i,
-                    "chunk_id": chunk_id,
-                    "content_hash": hashlib.md5(chunk.encode()).hexdigest()
-                })
-                chunk_metadata.append(chunk_meta)
+            # Prepare chunk IDs and metadata; chunks only carry what retrieval needs
+            # (the filename is resolved from the document record), and the chunk ID
+            # itself is the Chroma record ID
+            content_hashes = {chunk: _content_hash(chunk) for chunk in unique_chunks}
+            chunk_ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
+            chunk_metadata = [
+                {"doc_id": doc_id, "chunk_index": i, "h": content_hashes[chunk]}
+                for i, chunk in enumerate(chunks)
+            ]
             
-            # Add to ChromaDB
-            self.collection.add(
-                ids=chunk_ids,
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=chunk_metadata
-            )
+            # Index writes are blocking; keep them off the event loop
+            await asyncio.to_thread(self._add_chunks, chunk_ids, embeddings, chunks, chunk_metadata)
+            await asyncio.to_thread(self._put_document, document_record)
+            
+            self._stats_cache = None
+            self._filenames[doc_id] = filename
             
             logger.info(f"Added {len(chunks)} chunks for document {doc_id}")
             return len(chunks)
@@ -131,6 +320,91 @@ class VectorStore:
             logger.error(f"Failed to add document {doc_id}: {e}")
             raise
     
+    def _add_chunks(
+        self,
+        chunk_ids: List[str],
+        embeddings: List[List[float]],
+        chunks: List[str],
+        chunk_metadata: List[Dict[str, Any]]
+    ):
+        """Write prepared chunks to the index in bounded batches.
+        
+        One huge add makes Chroma build and persist everything in a single
+        transaction; fixed-size batches keep ingest time linear.
+        """
+        settings = get_settings()
+        batch_size = min(settings.chroma_add_batch_size, getattr(self.client, "max_batch_size", MAX_CHROMA_BATCH))
+        
+        for start in range(0, len(chunk_ids), batch_size):
+            end = start + batch_size
+            self.collection.add(
+                ids=chunk_ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=chunks[start:end],
+                metadatas=chunk_metadata[start:end]
+            )
+    
+    def _put_document(self, record: Dict[str, Any]):
+        """Store the document-level record for a document."""
+        self.documents.upsert(
+            ids=[record["doc_id"]],
+            embeddings=[DOCUMENT_PLACEHOLDER_EMBEDDING],
+            metadatas=[_to_chroma_metadata(record)]
+        )
+    
+    def _get_documents(self) -> List[Dict[str, Any]]:
+        """Return the document-level records of all documents."""
+        results = self.documents.get(include=["metadatas"])
+        return [_from_chroma_metadata(meta) for meta in results["metadatas"] or []]
+    
+    def _backfill_documents(self):
+        """Build document records from chunk metadata written before the side table existed."""
+        results = self.collection.get(include=["metadatas"])
+        
+        # Count chunks per document, keeping only a reference to the first chunk's metadata
+        aggregates: Dict[str, _DocAgg] = {}
+        for meta in results["metadatas"] or []:
+            doc_id = meta.get("doc_id")
+            if not doc_id:
+                continue
+            aggregate = aggregates.get(doc_id)
+            if aggregate is None:
+                aggregates[doc_id] = _DocAgg(meta)
+            else:
+                aggregate.chunks += 1
+        
+        records = [aggregate.to_record() for aggregate in aggregates.values()]
+        if records:
+            self.documents.upsert(
+                ids=[record["doc_id"] for record in records],
+                embeddings=[DOCUMENT_PLACEHOLDER_EMBEDDING] * len(records),
+                metadatas=[_to_chroma_metadata(record) for record in records]
+            )
+        
+        logger.info(f"Backfilled {len(records)} document records")
+    
+    def find_document_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the document record of an already ingested file with this hash."""
+        results = self.documents.get(
+            where={"file_hash": file_hash},
+            limit=1,
+            include=["metadatas"]
+        )
+        
+        if not results["metadatas"]:
+            return None
+        
+        return _from_chroma_metadata(results["metadatas"][0])
+    
+    def _get_filenames(self, doc_ids: Iterable[str]) -> Dict[str, str]:
+        """Return doc_id -> filename, reading unseen documents from the side table."""
+        missing = [doc_id for doc_id in set(doc_ids) if doc_id not in self._filenames]
+        if missing:
+            results = self.documents.get(ids=missing, include=["metadatas"])
+            for doc_id, meta in zip(results["ids"], results["metadatas"] or []):
+                self._filenames[doc_id] = meta.get("filename", "unknown")
+        return self._filenames
+    
     def search(
         self,
         query: str,
@@ -139,46 +413,7 @@ class VectorStore:
     ) -> List[RetrievedChunk]:
         """Search for relevant chunks."""
         try:
-            if top_k is None:
-                top_k = settings.top_k
-            
-            # Generate query embedding
-            query_embedding = self._get_embeddings([query])[0]
-            
-            # Prepare where clause for filtering
-            where_clause = None
-            if doc_ids:
-                where_clause = {"doc_id": {"$in": doc_ids}}
-            
-            # Search ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=where_clause,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            # Convert results to RetrievedChunk objects
-            chunks = []
-            if results["documents"] and results["documents"][0]:
-                documents = results["documents"][0]
-                metadatas = results["metadatas"][0]
-                distances = results["distances"][0]
-                
-                for doc, meta, distance in zip(documents, metadatas, distances):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    score = 1.0 - distance
-                    
-                    chunk = RetrievedChunk(
-                        doc_id=meta.get("doc_id", "unknown"),
-                        filename=meta.get("filename", "unknown"),
-                        chunk_index=meta.get("chunk_index", 0),
-                        content=doc,
-                        score=score,
-                        metadata=meta
-                    )
-                    chunks.append(chunk)
-            
+            chunks = self._search_by_vector(self._embed(query), top_k=top_k, doc_ids=doc_ids)
             logger.debug(f"Retrieved {len(chunks)} chunks for query: {query[:100]}...")
             return chunks
             
@@ -186,22 +421,90 @@ class VectorStore:
             logger.error(f"Failed to search vector store: {e}")
             raise
     
+    def _search_by_vector(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> List[RetrievedChunk]:
+        """Search for the chunks nearest to an already computed query embedding."""
+        settings = get_settings()
+        if top_k is None:
+            top_k = settings.top_k
+        
+        # Prepare where clause for filtering
+        where_clause = None
+        if doc_ids:
+            where_clause = {"doc_id": {"$in": doc_ids}}
+        
+        # Search ChromaDB; MMR reranks a larger candidate pool down to top_k
+        use_mmr = settings.mmr_enabled and settings.mmr_fetch_k > top_k
+        include = ["documents", "metadatas", "distances"]
+        if use_mmr:
+            include.append("embeddings")
+        
+        results = self.collection.query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=settings.mmr_fetch_k if use_mmr else top_k,
+            where=where_clause,
+            include=include
+        )
+        
+        # Convert results to RetrievedChunk objects
+        if not results["documents"] or not results["documents"][0]:
+            return []
+        
+        documents = results["documents"][0]
+        metadatas = results["metadatas"][0]
+        
+        # Convert distances to cosine similarities at once. Embeddings are unit
+        # length, so squared L2 is 2 - 2*cos and cosine/ip distance is 1 - cos
+        distances = np.asarray(results["distances"][0], dtype=np.float64)
+        if self._distance_space == "l2":
+            distances = distances / 2.0
+        scores = (1.0 - distances).tolist()
+        
+        order = range(len(documents))
+        if use_mmr and len(documents) > top_k:
+            order = _mmr_select(query_embedding, results["embeddings"][0], top_k, settings.mmr_lambda)
+        
+        # Chunks written before the compact layout still carry their filename
+        filenames = self._get_filenames(meta.get("doc_id", "unknown") for meta in metadatas)
+        
+        # Values come straight from our own collection, so skip model validation
+        chunks = [
+            RetrievedChunk.model_construct(
+                doc_id=metadatas[i].get("doc_id", "unknown"),
+                filename=metadatas[i].get("filename") or filenames.get(metadatas[i].get("doc_id"), "unknown"),
+                chunk_index=metadatas[i].get("chunk_index", 0),
+                content=documents[i],
+                score=scores[i],
+                metadata=metadatas[i]
+            )
+            for i in order
+        ]
+        
+        return chunks
+    
     def delete_document(self, doc_id: str) -> bool:
         """Delete all chunks for a document."""
         try:
             # Get all chunk IDs for the document
             results = self.collection.get(
                 where={"doc_id": doc_id},
-                include=["metadatas"]
+                include=[]
             )
             
             if not results["ids"]:
                 logger.warning(f"No chunks found for document {doc_id}")
                 return False
             
-            # Delete all chunks
+            # Delete all chunks and the document record
             chunk_ids = results["ids"]
             self.collection.delete(ids=chunk_ids)
+            self.documents.delete(ids=[doc_id])
+            self._stats_cache = None
+            self._filenames.pop(doc_id, None)
             
             logger.info(f"Deleted {len(chunk_ids)} chunks for document {doc_id}")
             return True
@@ -213,55 +516,8 @@ class VectorStore:
     def list_documents(self) -> List[DocumentInfo]:
         """List all documents in the vector store."""
         try:
-            # Get all document metadata
-            results = self.collection.get(include=["metadatas"])
-            
-            if not results["metadatas"]:
-                return []
-            
-            # Group by document ID
-            doc_map = {}
-            for meta in results["metadatas"]:
-                doc_id = meta.get("doc_id")
-                if not doc_id:
-                    continue
-                
-                if doc_id not in doc_map:
-                    doc_map[doc_id] = {
-                        "doc_id": doc_id,
-                        "filename": meta.get("filename", "unknown"),
-                        "uploaded_at": meta.get("uploaded_at"),
-                        "chunks": 0,
-                        "size": 0,
-                        "mime_type": meta.get("mime_type", "unknown"),
-                        "tags": meta.get("tags", []),
-                        "metadata": meta
-                    }
-                
-                doc_map[doc_id]["chunks"] += 1
-            
-            # Convert to DocumentInfo objects
-            documents = []
-            for doc_data in doc_map.values():
-                try:
-                    uploaded_at = datetime.fromisoformat(doc_data["uploaded_at"]) if doc_data["uploaded_at"] else datetime.utcnow()
-                except (ValueError, TypeError):
-                    uploaded_at = datetime.utcnow()
-                
-                doc_info = DocumentInfo(
-                    doc_id=doc_data["doc_id"],
-                    filename=doc_data["filename"],
-                    size=doc_data["size"],
-                    mime_type=doc_data["mime_type"],
-                    uploaded_at=uploaded_at,
-                    chunks=doc_data["chunks"],
-                    tags=doc_data["tags"] if isinstance(doc_data["tags"], list) else [],
-                    metadata=doc_data["metadata"]
-                )
-                documents.append(doc_info)
-            
-            # Sort by upload date (newest first)
-            documents.sort(key=lambda x: x.uploaded_at, reverse=True)
+            # One record per document, so this scales with documents, not chunks
+            documents = _build_document_infos(self._get_documents())
             
             logger.debug(f"Listed {len(documents)} documents")
             return documents
@@ -271,18 +527,24 @@ class VectorStore:
             raise
     
     def get_document_stats(self) -> Dict[str, Any]:
-        """Get statistics about the vector store."""
+        """Get statistics about the vector store (cached for stats_cache_ttl seconds)."""
+        settings = get_settings()
+        cached = self._stats_cache
+        if cached is not None and time.monotonic() - cached[0] < settings.stats_cache_ttl:
+            return cached[1]
+        
         try:
             total_chunks = self.collection.count()
-            documents = self.list_documents()
+            total_documents = self.documents.count()
             
             stats = {
-                "total_documents": len(documents),
+                "total_documents": total_documents,
                 "total_chunks": total_chunks,
-                "avg_chunks_per_doc": total_chunks / len(documents) if documents else 0,
+                "avg_chunks_per_doc": total_chunks / total_documents if total_documents else 0,
                 "collection_name": self.collection.name
             }
             
+            self._stats_cache = (time.monotonic(), stats)
             return stats
             
         except Exception as e:
@@ -290,5 +552,114 @@ class VectorStore:
             return {"error": str(e)}
 
 
-# Global vector store instance
-vector_store = VectorStore()
+def _mmr_select(
+    query_embedding: Any,
+    candidate_embeddings: Any,
+    top_k: int,
+    lambda_mult: float
+) -> List[int]:
+    """Pick top_k candidate indices by maximal marginal relevance.
+    
+    Each step takes the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, selected)).
+    All similarities come from two matrix products on L2-normalized float32
+    vectors, so the loop only does O(candidates) vector updates per pick.
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    
+    for _ in range(1, min(top_k, len(candidates))):
+        mmr = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        mmr[selected] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    
+    return selected
+
+
+def _to_chroma_metadata(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a document record to Chroma's scalar-only metadata."""
+    meta = {k: v for k, v in record.items() if v is not None}
+    if isinstance(meta.get("tags"), list):
+        meta["tags"] = ",".join(meta["tags"])
+    return meta
+
+
+def _from_chroma_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of _to_chroma_metadata."""
+    record = dict(meta)
+    tags = record.get("tags")
+    if isinstance(tags, str):
+        record["tags"] = [tag for tag in tags.split(",") if tag]
+    return record
+
+
+def _parse_uploaded_at(value: Any) -> datetime:
+    """Read an upload time stored as epoch seconds or, for older records, an ISO string."""
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    if value:
+        return datetime.fromisoformat(value)
+    return datetime.utcnow()
+
+
+def _build_document_infos(records: Iterable[Dict[str, Any]]) -> List[DocumentInfo]:
+    """Convert document records to DocumentInfo objects, newest first."""
+    documents = []
+    for record in records:
+        try:
+            uploaded_at = _parse_uploaded_at(record.get("uploaded_at"))
+        except (ValueError, TypeError, OverflowError):
+            uploaded_at = datetime.utcnow()
+        
+        tags = record.get("tags", [])
+        doc_info = DocumentInfo(
+            doc_id=record["doc_id"],
+            filename=record.get("filename", "unknown"),
+            size=record.get("file_size", 0),
+            mime_type=record.get("mime_type", "unknown"),
+            uploaded_at=uploaded_at,
+            chunks=record.get("total_chunks", 0),
+            tags=tags if isinstance(tags, list) else [],
+            metadata=record
+        )
+        documents.append(doc_info)
+    
+    # Sort by upload date (newest first)
+    documents.sort(key=lambda x: x.uploaded_at, reverse=True)
+    return documents
+
+
+def _create_vector_store() -> VectorStore:
+    """Create the vector store for the configured backend."""
+    settings = get_settings()
+    if settings.vector_backend == "faiss":
+        from .faiss_store import FaissVectorStore
+        return FaissVectorStore()
+    return VectorStore()
+
+
+# Global vector store instance, created on first use so importing this module
+# doesn't open the index or construct Azure clients
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Get the process-wide vector store, creating it on first call."""
+    global _vector_store
+    if _vector_store is None:
+        # Requests arriving together on worker threads must not build two stores
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = _create_vector_store()
+    return _vector_store
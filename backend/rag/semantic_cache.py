@@ -0,0 +1,167 @@
+"""Semantic response cache for the RAG pipeline."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .models import RAGResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    """A cached response and the time it was stored."""
+    response: RAGResponse
+    timestamp: float
+
+
+class CacheGeneration:
+    """Invalidation counter shared by worker processes through a SQLite file.
+    
+    Each API worker keeps its own SemanticCache, so a knowledge-base change
+    handled by one worker bumps this counter and the others clear their
+    caches the next time they see a new value.
+    """
+    
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0)")
+        self._conn.commit()
+    
+    def current(self) -> int:
+        """Return the current generation."""
+        with self._lock:
+            return self._conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+    
+    def bump(self) -> int:
+        """Advance the generation, invalidating every worker's cache; returns the new value."""
+        with self._lock:
+            self._conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+            self._conn.commit()
+            return self._conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+
+class SemanticCache:
+    """Similarity-keyed LRU cache of RAG responses.
+
+    Query embeddings are L2-normalized, quantized to int8 with a per-vector
+    scale (scale = max|v| / 127) and stored as rows of a fixed-size matrix,
+    so a lookup is a single integer matrix-vector product followed by an
+    argmax. Entries are evicted in least-recently-used order.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: int = 0):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._scales = np.zeros(max_entries, dtype=np.float32)
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _quantize(embedding: np.ndarray) -> Optional[Tuple[np.ndarray, float]]:
+        """Return the unit-length embedding as int8 codes and their scale."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            return None
+        vec = vec / norm
+        scale = float(np.abs(vec).max()) / 127
+        return np.round(vec / scale).astype(np.int8), scale
+
+    def _evict(self, slot: int):
+        """Free a slot (caller must hold the lock)."""
+        self._entries.pop(slot, None)
+        self._occupied[slot] = False
+
+    def get(self, embedding: np.ndarray) -> Optional[RAGResponse]:
+        """Return the cached response for the most similar prior query, if any."""
+        quantized = self._quantize(embedding)
+
+        with self._lock:
+            if quantized is None or self._matrix is None or not self._entries:
+                self.misses += 1
+                return None
+
+            codes, scale = quantized
+            # Accumulate in int32; int8 products overflow int8
+            dots = np.matmul(self._matrix, codes, dtype=np.int32)
+            sims = dots * (self._scales * scale)
+            sims[~self._occupied] = -1.0
+            slot = int(np.argmax(sims))
+
+            if sims[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[slot]
+            if self.ttl_seconds and time.time() - entry.timestamp > self.ttl_seconds:
+                self._evict(slot)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+
+        logger.debug(f"Semantic cache hit (similarity={sims[slot]:.3f})")
+        return entry.response
+
+    def put(self, embedding: np.ndarray, response: RAGResponse):
+        """Store a response keyed by its query embedding."""
+        quantized = self._quantize(embedding)
+        if quantized is None or self.max_entries < 1:
+            return
+        codes, scale = quantized
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, codes.shape[0]), dtype=np.int8)
+
+            if len(self._entries) >= self.max_entries:
+                slot, _ = self._entries.popitem(last=False)
+            else:
+                slot = int(np.argmin(self._occupied))
+
+            self._matrix[slot] = codes
+            self._scales[slot] = scale
+            self._occupied[slot] = True
+            self._entries[slot] = _CacheEntry(response=response, timestamp=time.time())
+
+    def clear(self):
+        """Drop all cached responses (e.g. after the knowledge base changes)."""
+        with self._lock:
+            self._entries.clear()
+            self._occupied[:] = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
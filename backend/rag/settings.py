@@ -1,12 +1,30 @@
 """Configuration settings for the RAG application."""
 
-from pydantic_settings import BaseSettings
-from typing import List
+from functools import cached_property, lru_cache
+from dotenv import dotenv_values
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Dict, FrozenSet, Optional
+import logging
 import os
+import sys
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
+    """Application settings loaded from environment variables.
+    
+    Settings are immutable for the lifetime of the process: the instance is
+    frozen and built once by get_settings().
+    """
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore",
+        frozen=True
+    )
     
     # Azure OpenAI Configuration
     azure_openai_endpoint: str
@@ -17,17 +35,58 @@ class Settings(BaseSettings):
     
     # Vector Store Configuration
     chroma_dir: str = "./data/chroma"
+    chroma_host: str = ""  # set to use a Chroma server instead of chroma_dir
+    chroma_port: int = 8000
+    chroma_add_batch_size: int = 5000  # records per Chroma write
+    stats_cache_ttl: float = 5.0  # seconds to reuse collection counts
+    vector_backend: str = "chroma"  # "chroma" or "faiss" (in-process, single worker)
+    faiss_dir: str = "./data/faiss"
+    faiss_index_type: str = "flat"  # "flat" (exact) or "hnsw"
+    faiss_hnsw_m: int = 32
+    
+    # Persistent Embedding Cache
+    embed_cache_enabled: bool = True
+    embed_cache_path: str = "./data/embed_cache.sqlite3"
+    embed_cache_max_entries: int = 100000  # least recently used vectors beyond this are pruned; 0 = unbounded
+    query_embed_cache_size: int = 1024  # in-memory LRU of query embeddings
+    
+    # Ingestion Embedding Batches
+    embed_batch_size: int = 128
+    embed_max_concurrency: int = 8
     
     # RAG Parameters
     max_tokens: int = 1024
     temperature: float = 0.2
     top_k: int = 6
-    chunk_size: int = 800
-    chunk_overlap: int = 100
+    mmr_enabled: bool = False  # rerank retrieval for diversity (maximal marginal relevance)
+    mmr_fetch_k: int = 24  # candidates considered by MMR
+    mmr_lambda: float = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+    chunk_size_tokens: int = 512
+    chunk_overlap_tokens: int = 64
+    min_chunk_tokens: int = 100  # smaller chunks are merged into a neighbour
+    
+    # Semantic Response Cache
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 1024  # 0 disables the cache
+    semantic_cache_ttl_seconds: int = 3600
+    semantic_cache_sync_path: str = "./data/semantic_cache.sqlite3"  # shared invalidation counter
     
     # File Upload Configuration
     allowed_mime: str = "application/pdf,text/plain,text/markdown,text/html,application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     max_file_size: int = 50000000  # 50MB
+    file_size_mb_threshold: int = 8  # uploads up to this size are processed in memory
+    upload_tmp_dir: str = ""  # empty = system temp dir; /dev/shm stages in tmpfs if it's large enough
+    pdf_pages_per_task: int = 8  # PDF pages extracted per worker task
+    
+    # Concurrency
+    web_concurrency: int = 0  # API worker processes (also read by uvicorn); 0 = automatic in main.py
+    thread_pool_size: int = 100
+    max_concurrent_ingests: int = 0  # total across workers; 0 = 1.5 x CPU cores
+    
+    # LLM Requests
+    llm_max_concurrency: int = 32
+    llm_timeout: float = 60.0  # seconds
     
     # Environment
     environment: str = "development"
@@ -40,22 +99,74 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-key-change-in-production"
     session_expire_minutes: int = 1440  # 24 hours
     
-    @property
-    def allowed_mime_types(self) -> List[str]:
-        """Get list of allowed MIME types."""
-        return [mime.strip() for mime in self.allowed_mime.split(",")]
+    @cached_property
+    def allowed_mime_types(self) -> FrozenSet[str]:
+        """Get the set of allowed MIME types (computed once, interned for fast comparison)."""
+        return frozenset(sys.intern(mime.strip()) for mime in self.allowed_mime.split(","))
     
     @property
+    def upload_staging_directory(self) -> Optional[str]:
+        """Get directory for staging uploads (None = the system temp directory).
+        
+        tmpfs is opt-in: /dev/shm is only 64MB under plain Docker and Kubernetes,
+        too small for a few concurrent large uploads.
+        """
+        return self.upload_tmp_dir or None
+    
+    @cached_property
+    def api_workers(self) -> int:
+        """Get the number of API worker processes to start (computed once).
+        
+        The FAISS index lives in process memory, so that backend always runs a
+        single worker; otherwise workers need a Chroma server to share an index.
+        """
+        if self.vector_backend == "faiss":
+            return 1
+        if self.web_concurrency:
+            return self.web_concurrency
+        return (os.cpu_count() or 1) if self.chroma_host else 1
+    
+    @cached_property
     def chroma_persist_directory(self) -> str:
-        """Get absolute path for ChromaDB persistence directory."""
+        """Get absolute path for ChromaDB persistence directory (computed once)."""
         if os.path.isabs(self.chroma_dir):
             return self.chroma_dir
         return os.path.abspath(self.chroma_dir)
+
+
+@lru_cache(maxsize=1)
+def _env_file_values() -> Dict[str, str]:
+    """Parse the .env file once per process, with lower-cased keys."""
+    values = dotenv_values(
+        Settings.model_config["env_file"],
+        encoding=Settings.model_config["env_file_encoding"]
+    )
+    return {key.lower(): value for key, value in values.items() if value is not None}
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the global settings instance, loading it on first use.
+    
+    The environment overrides .env, as with pydantic-settings' own sources;
+    the preparsed .env is shared, so rebuilding Settings never re-reads it.
+    """
+    env_file_values = _env_file_values()
+    # Unknown .env keys are ignored; name them so renamed settings don't go unnoticed
+    for key in sorted(env_file_values.keys() - Settings.model_fields.keys()):
+        logger.warning(f"Ignoring unknown setting {key.upper()} in {Settings.model_config['env_file']}")
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    values = {**env_file_values, **{key.lower(): value for key, value in os.environ.items()}}
+    return Settings(
+        _env_file=None,
+        **{key: value for key, value in values.items() if key in Settings.model_fields}
+    )
 
 
-# Global settings instance
-settings = Settings()
+def __getattr__(name: str):
+    # Backward-compatible ``settings`` attribute (PEP 562); importing the name
+    # loads settings immediately, so library code calls get_settings() at the
+    # point of use instead
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
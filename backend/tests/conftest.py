@@ -0,0 +1,37 @@
+"""Shared fixtures for backend tests."""
+
+import chromadb
+import pytest
+from chromadb.config import Settings as ChromaSettings
+
+from rag.settings import get_settings
+
+
+@pytest.fixture
+def settings_env(monkeypatch, tmp_path):
+    """Point settings at a throwaway data directory, with dummy Azure credentials."""
+    env = {
+        "AZURE_OPENAI_ENDPOINT": "https://example.openai.azure.com",
+        "AZURE_OPENAI_API_KEY": "test-key",
+        "VECTOR_BACKEND": "chroma",
+        "CHROMA_HOST": "",
+        "CHROMA_DIR": str(tmp_path / "chroma"),
+        "FAISS_DIR": str(tmp_path / "faiss"),
+        "EMBED_CACHE_ENABLED": "false",
+        "SEMANTIC_CACHE_SYNC_PATH": str(tmp_path / "semantic_cache.sqlite3"),
+    }
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    get_settings.cache_clear()
+    yield tmp_path
+    get_settings.cache_clear()
+
+
+@pytest.fixture
+def chroma_client(settings_env):
+    """Chroma client on the test data directory, for writing pre-existing stores."""
+    # Same settings as VectorStore, so both share Chroma's per-path system
+    return chromadb.PersistentClient(
+        path=str(settings_env / "chroma"),
+        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)
+    )
@@ -0,0 +1,19 @@
+"""Tests for the optional FAISS backend."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from rag.faiss_store import FaissVectorStore
+
+
+def test_normalized_leaves_cached_embedding_untouched():
+    embedding = np.array([3.0, 4.0], dtype=np.float32)
+    # Query embeddings are shared, read-only cache entries
+    embedding.setflags(write=False)
+
+    matrix = FaissVectorStore._normalized(embedding)
+
+    np.testing.assert_allclose(matrix, [[0.6, 0.8]], rtol=1e-6)
+    np.testing.assert_array_equal(embedding, [3.0, 4.0])
@@ -0,0 +1,47 @@
+"""Tests for the semantic-cache handling in RAGGraph."""
+
+import asyncio
+
+import numpy as np
+
+from rag.graph import RAGGraph
+from rag.models import RAGResponse
+
+EMBEDDING = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+
+
+def test_zero_max_entries_disables_the_cache(settings_env, monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_MAX_ENTRIES", "0")
+    assert RAGGraph().semantic_caches == {}
+
+
+def test_answer_is_cached_when_knowledge_base_is_unchanged(settings_env):
+    graph = RAGGraph()
+    generation = graph.cache_generation.current()
+
+    asyncio.run(graph._cache_response(EMBEDDING, True, generation, RAGResponse(answer="a", confidence=0.9)))
+
+    assert graph.semantic_caches[True].get(EMBEDDING).answer == "a"
+    assert graph.semantic_caches[False].get(EMBEDDING) is None
+
+
+def test_answer_generated_across_an_upload_is_not_cached(settings_env):
+    graph = RAGGraph()
+    generation = graph.cache_generation.current()
+    # An upload or delete lands while the answer is being generated
+    graph.clear_semantic_cache()
+
+    asyncio.run(graph._cache_response(EMBEDDING, True, generation, RAGResponse(answer="stale", confidence=0.9)))
+
+    assert graph.semantic_caches[True].get(EMBEDDING) is None
+
+
+def test_other_workers_upload_blocks_caching(settings_env):
+    graph = RAGGraph()
+    other_worker = RAGGraph()
+    generation = graph.cache_generation.current()
+    other_worker.clear_semantic_cache()
+
+    asyncio.run(graph._cache_response(EMBEDDING, True, generation, RAGResponse(answer="stale", confidence=0.9)))
+
+    assert graph.semantic_caches[True].get(EMBEDDING) is None
@@ -0,0 +1,57 @@
+"""Tests for text decoding, segmentation and chunk merging."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from rag import ingest
+from rag.ingest import _iter_text_blocks, _iter_text_segments, document_processor
+
+
+def test_segments_end_on_paragraph_breaks():
+    blocks = ["a b\n\nc", "d\n\ne f"]
+    assert list(_iter_text_segments(blocks)) == ["a b", "cd", "e f"]
+
+
+def test_segments_fall_back_to_line_then_space():
+    assert list(_iter_text_segments(["one\ntwo", " three"])) == ["one", "two", "three"]
+    assert list(_iter_text_segments(["alpha be", "ta gamma"])) == ["alpha", "beta", "gamma"]
+
+
+def test_unbroken_text_is_cut_at_max_pending():
+    blocks = ["abcd"] * 5
+    segments = list(_iter_text_segments(blocks, max_pending=6))
+    assert "".join(segments) == "abcd" * 5
+    assert max(len(segment) for segment in segments) < 6 + 4
+
+
+def test_blocks_keep_multibyte_characters_intact(monkeypatch):
+    monkeypatch.setattr(ingest, "_TEXT_BLOCK_SIZE", 3)
+    text = "héllo wörld — ✓\n"
+    blocks = list(_iter_text_blocks(memoryview(text.encode("utf-8"))))
+    assert "".join(blocks) == text
+
+
+@pytest.fixture
+def word_tokens(monkeypatch):
+    """Count one token per word, with chunks of at most 6 and at least 3 tokens."""
+    monkeypatch.setattr(ingest, "_token_length", lambda text: len(text.split()))
+    monkeypatch.setattr(
+        ingest, "get_settings", lambda: SimpleNamespace(chunk_size_tokens=6, min_chunk_tokens=3)
+    )
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    # Small tail folds into its predecessor
+    (["one two three four", "five"], ["one two three four\n\nfive"]),
+    # Small head absorbs the next chunk, landing exactly on the size limit
+    (["a b", "c d e f"], ["a b\n\nc d e f"]),
+    # Merging would exceed chunk_size_tokens
+    (["a b c d e", "f g"], ["a b c d e", "f g"]),
+    # Both chunks already meet min_chunk_tokens
+    (["a b c", "d e f"], ["a b c", "d e f"]),
+    # Whitespace is stripped and empty pieces dropped
+    (["  a  ", "", "   ", "b c d"], ["a\n\nb c d"]),
+])
+def test_merge_small_chunks(word_tokens, chunks, expected):
+    assert document_processor._merge_small_chunks(chunks) == expected
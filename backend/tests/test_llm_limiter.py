@@ -0,0 +1,46 @@
+"""Tests for the chat-completion concurrency limiter."""
+
+import asyncio
+from types import SimpleNamespace
+
+from rag.llm_limiter import LLMLimiter
+
+
+class _FakeStream:
+    def __init__(self):
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+
+class _FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **params):
+        self.calls.append(params)
+        return _FakeStream() if params.get("stream") else "completion"
+
+
+def test_open_stream_holds_its_slot():
+    async def scenario():
+        client = _FakeClient()
+        limiter = LLMLimiter(client, max_concurrency=1)
+
+        async with limiter.stream(model="m") as stream:
+            waiting = asyncio.create_task(limiter.submit(model="m"))
+            await asyncio.sleep(0)
+            # The plain call queues while the stream is open
+            assert not waiting.done()
+            assert len(client.calls) == 1
+
+        assert stream.closed
+        assert await waiting == "completion"
+        assert client.calls == [{"model": "m", "stream": True}, {"model": "m"}]
+
+    asyncio.run(scenario())
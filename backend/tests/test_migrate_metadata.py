@@ -0,0 +1,97 @@
+"""Tests for the document-record backfill and the compact metadata migration."""
+
+import json
+
+import numpy as np
+import pytest
+
+import migrate_metadata
+from rag.retriever import CHUNK_COLLECTION, VectorStore, _content_hash
+
+LEGACY_UPLOADED_AT = "2024-01-02T03:04:05"
+LEGACY_EPOCH = 1704164645
+
+
+def _write_legacy_chunks(chroma_client):
+    """Store two chunks the way they were written before the documents side table."""
+    contents = ["first chunk", "second chunk"]
+    chroma_client.create_collection(CHUNK_COLLECTION).add(
+        ids=["old_0", "old_1"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        documents=contents,
+        metadatas=[
+            {
+                "doc_id": "old",
+                "filename": "old.txt",
+                "mime_type": "text/plain",
+                "file_hash": "fh",
+                "tags": "a,b",
+                "uploaded_at": LEGACY_UPLOADED_AT,
+                "chunk_index": i,
+                "content_hash": f"md5-{i}",
+            }
+            for i in range(len(contents))
+        ]
+    )
+    return contents
+
+
+def test_opening_a_legacy_store_backfills_document_records(chroma_client):
+    _write_legacy_chunks(chroma_client)
+
+    store = VectorStore()
+
+    [record] = store._get_documents()
+    assert record["doc_id"] == "old"
+    assert record["filename"] == "old.txt"
+    assert record["tags"] == ["a", "b"]
+    assert record["total_chunks"] == 2
+    assert "chunk_index" not in record and "content_hash" not in record
+    assert store.find_document_by_hash("fh")["doc_id"] == "old"
+
+
+def test_migration_compacts_chunks_and_upload_times(chroma_client):
+    contents = _write_legacy_chunks(chroma_client)
+    store = VectorStore()
+
+    migrate_metadata.migrate_chroma(store)
+
+    chunks = store.collection.get(ids=["old_0", "old_1"], include=["metadatas"])
+    assert chunks["metadatas"] == [
+        {"doc_id": "old", "chunk_index": i, "h": _content_hash(content)}
+        for i, content in enumerate(contents)
+    ]
+    [record] = store._get_documents()
+    assert record["uploaded_at"] == LEGACY_EPOCH
+
+    # Filenames now come from the document record
+    [chunk] = store._search_by_vector(np.array([1.0, 0.0], dtype=np.float32), top_k=1)
+    assert chunk.filename == "old.txt"
+
+
+def test_migration_is_idempotent(chroma_client):
+    _write_legacy_chunks(chroma_client)
+    store = VectorStore()
+    migrate_metadata.migrate_chroma(store)
+    before = store.collection.get(include=["metadatas"])
+
+    migrate_metadata.migrate_chroma(store)
+
+    assert store.collection.get(include=["metadatas"]) == before
+
+
+def test_faiss_migration_compacts_side_tables(settings_env):
+    pytest.importorskip("faiss")
+    from rag.faiss_store import FaissVectorStore
+
+    store = FaissVectorStore()
+    legacy_meta = {"doc_id": "old", "filename": "old.txt", "chunk_index": 0, "content_hash": "md5-0"}
+    store._add_chunks(["old_0"], [[1.0, 0.0]], ["first chunk"], [legacy_meta])
+    store._put_document({"doc_id": "old", "filename": "old.txt", "uploaded_at": LEGACY_UPLOADED_AT})
+
+    migrate_metadata.migrate_faiss(store)
+
+    [(metadata,)] = store.db.execute("SELECT metadata FROM chunks").fetchall()
+    assert json.loads(metadata) == {"doc_id": "old", "chunk_index": 0, "h": _content_hash("first chunk")}
+    [record] = store._get_documents()
+    assert record["uploaded_at"] == LEGACY_EPOCH
@@ -0,0 +1,98 @@
+"""Tests for the vector store and retrieval helpers."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from rag.retriever import CHUNK_COLLECTION, VectorStore, _mmr_select
+
+QUERY = np.array([1.0, 0.0, 0.0])
+
+# Two near-duplicates of each other and one less relevant but different candidate
+CANDIDATES = np.array([
+    [0.90, 0.436, 0.0],
+    [0.89, 0.456, 0.0],
+    [0.85, 0.0, 0.527],
+])
+
+
+def test_pure_relevance_order_without_diversity():
+    assert _mmr_select(QUERY, CANDIDATES, top_k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_diverse_candidate_beats_near_duplicate():
+    assert _mmr_select(QUERY, CANDIDATES, top_k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_inputs_need_not_be_normalized():
+    scaled = CANDIDATES * np.array([[3.0], [0.5], [7.0]])
+    assert _mmr_select(QUERY * 4.0, scaled, top_k=3, lambda_mult=0.5) == _mmr_select(
+        QUERY, CANDIDATES, top_k=3, lambda_mult=0.5
+    )
+
+
+def test_top_k_is_capped_at_candidate_count():
+    picks = _mmr_select(QUERY, CANDIDATES, top_k=10, lambda_mult=0.5)
+    assert sorted(picks) == [0, 1, 2]
+
+
+def test_new_chunk_collection_uses_cosine_space(settings_env):
+    store = VectorStore()
+    assert store.collection.metadata["hnsw:space"] == "cosine"
+
+
+def test_legacy_l2_collection_scores_are_cosine(chroma_client):
+    legacy = chroma_client.create_collection(CHUNK_COLLECTION)
+    legacy.add(
+        ids=["doc_0"],
+        embeddings=[[1.0, 0.0]],
+        documents=["hello"],
+        metadatas=[{"doc_id": "doc", "chunk_index": 0, "h": 1}]
+    )
+
+    store = VectorStore()
+    # Opening the store must not relabel the existing index
+    assert "hnsw:space" not in (store.collection.metadata or {})
+
+    [chunk] = store._search_by_vector(np.array([0.6, 0.8], dtype=np.float32), top_k=1)
+    assert chunk.score == pytest.approx(0.6, abs=1e-6)
+
+
+def _fake_embeddings(store):
+    """Replace Azure embedding calls with deterministic vectors, recording each request."""
+    requests = []
+
+    async def embed(texts):
+        requests.append(list(texts))
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    store._arequest_embeddings = embed
+    return requests
+
+
+def test_add_document_embeds_repeated_chunks_once(settings_env):
+    store = VectorStore()
+    requests = _fake_embeddings(store)
+
+    added = asyncio.run(store.add_document("doc", "notes.txt", ["alpha", "beta", "alpha"]))
+
+    assert added == 3
+    assert requests == [["alpha", "beta"]]
+    stored = store.collection.get(ids=["doc_0", "doc_2"], include=["embeddings", "metadatas"])
+    first, repeat = stored["embeddings"]
+    assert list(first) == list(repeat)
+    assert stored["metadatas"][0]["h"] == stored["metadatas"][1]["h"]
+
+
+def test_find_document_by_hash_returns_the_stored_record(settings_env):
+    store = VectorStore()
+    _fake_embeddings(store)
+    asyncio.run(store.add_document("doc", "notes.txt", ["alpha"], {"file_hash": "abc", "tags": ["x", "y"]}))
+
+    record = store.find_document_by_hash("abc")
+
+    assert record["doc_id"] == "doc"
+    assert record["filename"] == "notes.txt"
+    assert record["tags"] == ["x", "y"]
+    assert store.find_document_by_hash("missing") is None
@@ -0,0 +1,91 @@
+"""Tests for the int8 semantic response cache."""
+
+import numpy as np
+import pytest
+
+from rag import semantic_cache
+from rag.models import RAGResponse
+from rag.semantic_cache import SemanticCache
+
+DIM = 1536
+
+
+def _unit(vec):
+    return vec / np.linalg.norm(vec)
+
+
+def _pair_with_cosine(rng, cosine):
+    """Two random unit vectors whose float cosine similarity is exactly `cosine`."""
+    a = _unit(rng.standard_normal(DIM))
+    u = rng.standard_normal(DIM)
+    u = _unit(u - (u @ a) * a)
+    return a, cosine * a + np.sqrt(1.0 - cosine ** 2) * u
+
+
+def _basis(i):
+    vec = np.zeros(DIM, dtype=np.float32)
+    vec[i] = 1.0
+    return vec
+
+
+def test_quantized_similarity_tracks_float_cosine():
+    rng = np.random.default_rng(0)
+    for cosine in (0.90, 0.95, 0.99):
+        a, b = _pair_with_cosine(rng, cosine)
+        codes_a, scale_a = SemanticCache._quantize(a)
+        codes_b, scale_b = SemanticCache._quantize(b)
+        approx = float(np.dot(codes_a.astype(np.int32), codes_b.astype(np.int32))) * scale_a * scale_b
+        assert approx == pytest.approx(cosine, abs=2e-3)
+
+
+@pytest.mark.parametrize("cosine, hit", [(0.955, True), (0.945, False)])
+def test_threshold_decision_matches_float_cosine(cosine, hit):
+    rng = np.random.default_rng(1)
+    cache = SemanticCache(max_entries=4, threshold=0.95)
+    for _ in range(20):
+        cache.clear()
+        a, b = _pair_with_cosine(rng, cosine)
+        cache.put(a, RAGResponse(answer="cached"))
+        assert (cache.get(b) is not None) is hit
+
+
+def test_zero_vector_is_never_cached():
+    cache = SemanticCache(max_entries=2, threshold=0.5)
+    cache.put(np.zeros(DIM), RAGResponse(answer="cached"))
+    assert cache.get(np.zeros(DIM)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_capacity_cache_stores_nothing():
+    cache = SemanticCache(max_entries=0, threshold=0.5)
+    cache.put(_basis(0), RAGResponse(answer="cached"))
+    assert cache.get(_basis(0)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2, threshold=0.95)
+    cache.put(_basis(0), RAGResponse(answer="a"))
+    cache.put(_basis(1), RAGResponse(answer="b"))
+
+    # Touch "a" so "b" becomes the least recently used
+    assert cache.get(_basis(0)).answer == "a"
+    cache.put(_basis(2), RAGResponse(answer="c"))
+
+    assert cache.get(_basis(1)) is None
+    assert cache.get(_basis(0)).answer == "a"
+    assert cache.get(_basis(2)).answer == "c"
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_entry_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticCache(max_entries=2, threshold=0.95, ttl_seconds=60)
+    cache.put(_basis(0), RAGResponse(answer="a"))
+
+    now[0] += 59
+    assert cache.get(_basis(0)).answer == "a"
+
+    now[0] += 2
+    assert cache.get(_basis(0)) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "hit_rate": 0.5}
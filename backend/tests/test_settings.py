@@ -0,0 +1,37 @@
+"""Tests for settings loading."""
+
+import logging
+
+import pytest
+
+from rag import settings as settings_module
+from rag.settings import Settings, get_settings
+
+
+@pytest.fixture
+def env_file(settings_env, monkeypatch):
+    """Run from a directory whose .env the test writes."""
+    monkeypatch.chdir(settings_env)
+    settings_module._env_file_values.cache_clear()
+    yield settings_env / ".env"
+    settings_module._env_file_values.cache_clear()
+
+
+def test_unknown_env_file_keys_are_named(env_file, caplog):
+    env_file.write_text("CHUNK_SIZE_TOKENS=256\nCHUNK_SIZE=1000\n")
+
+    with caplog.at_level(logging.WARNING, logger=settings_module.__name__):
+        settings = get_settings()
+
+    assert settings.chunk_size_tokens == 256
+    assert [record.getMessage() for record in caplog.records] == [
+        "Ignoring unknown setting CHUNK_SIZE in .env"
+    ]
+
+
+def test_direct_construction_ignores_unrelated_keys(env_file):
+    env_file.write_text("UNRELATED_TOOL_TOKEN=x\n")
+
+    settings = Settings(_env_file=".env")
+
+    assert not hasattr(settings, "unrelated_tool_token")